@@ -1,29 +1,52 @@
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 from urllib.parse import urlparse
 
 import asyncpg
 from dotenv import load_dotenv
+from fastapi import HTTPException, status
 
+from app.db.instrumentation import InstrumentedConnection
 from app.utils.logger import logger
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5"))
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+DB_POOL_MAX_QUERIES = int(os.getenv("DB_POOL_MAX_QUERIES", "50000"))
+
+pool: Optional[asyncpg.Pool] = None
+
+
+def _connection_params() -> dict:
+    if not DATABASE_URL:
+        logger.error("DATABASE_URL is not set in the environment variables")
+        raise ValueError("DATABASE_URL is not set in the environment variables")
+
+    result = urlparse(DATABASE_URL)
+    return {
+        "database": result.path[1:],
+        "user": result.username,
+        "password": result.password,
+        "host": result.hostname,
+        "port": result.port,
+    }
+
 
 async def get_db_connection() -> asyncpg.Connection:
+    """
+    Open a standalone connection outside the pool.
+    Request handlers should depend on get_db instead.
+    """
     try:
-        if not DATABASE_URL:
-            logger.error("DATABASE_URL is not set in the environment variables")
-            raise ValueError("DATABASE_URL is not set in the environment variables")
-
-        result = urlparse(DATABASE_URL)
         connection: asyncpg.Connection = await asyncpg.connect(
-            database=result.path[1:],
-            user=result.username,
-            password=result.password,
-            host=result.hostname,
-            port=result.port,
+            **_connection_params(), connection_class=InstrumentedConnection
         )
         logger.info("Successfully connected to database")
         return connection
@@ -32,5 +55,75 @@ async def get_db_connection() -> asyncpg.Connection:
         raise e
 
 
-if __name__ == "__main__":
-    get_db_connection()
+async def init_db_pool() -> asyncpg.Pool:
+    """
+    Create the process-wide connection pool. Called once from the app lifespan.
+    """
+    global pool
+    if pool is not None:
+        return pool
+
+    try:
+        pool = await asyncpg.create_pool(
+            **_connection_params(),
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            max_queries=DB_POOL_MAX_QUERIES,
+            max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+            connection_class=InstrumentedConnection,
+        )
+        logger.info(
+            f"Database pool created (min_size={DB_POOL_MIN_SIZE}, max_size={DB_POOL_MAX_SIZE})"
+        )
+        return pool
+    except Exception as e:
+        logger.error(f"Error creating database pool: {e}")
+        raise e
+
+
+async def close_db_pool() -> None:
+    global pool
+    if pool is None:
+        return
+
+    await pool.close()
+    pool = None
+    logger.info("Database pool closed")
+
+
+def get_db_pool() -> asyncpg.Pool:
+    if pool is None:
+        raise RuntimeError("Database pool has not been initialized")
+    return pool
+
+
+@asynccontextmanager
+async def acquire_db() -> AsyncIterator[asyncpg.Connection]:
+    """
+    Borrow a connection from the pool for part of a request, for handlers
+    that must not hold one while they wait on something else. Like get_db,
+    answers 503 if none frees up within DB_POOL_ACQUIRE_TIMEOUT.
+    """
+    db_pool = get_db_pool()
+    try:
+        connection = await db_pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error acquiring database connection: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy. Please try again later.",
+        ) from e
+
+    try:
+        yield connection
+    finally:
+        await db_pool.release(connection)
+
+
+async def get_db() -> AsyncIterator[asyncpg.Connection]:
+    """
+    FastAPI dependency that borrows a connection from the pool for the
+    duration of a request and always returns it afterwards.
+    """
+    async with acquire_db() as connection:
+        yield connection
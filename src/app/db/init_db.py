@@ -1,24 +1,392 @@
+import argparse
+import asyncio
+import hashlib
 import os
+import re
+import time
+from typing import List, NamedTuple, Optional
 
 from asyncpg import Connection
 
+from app.db.connection import get_db_connection
 from app.utils.logger import logger
 
+MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), "migrations")
 
-async def create_tables(connection: Connection):
-    migrations_path = os.path.join(os.path.dirname(__file__), "migrations")
+# Apply pending migrations from the app lifespan instead of running this
+# module by hand before a deploy
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Longest a migration statement waits for a table lock before failing, so a
+# migration queued behind a long query does not stall every request queued
+# behind it in turn; an empty string waits forever
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "10s")
 
-    sql_files = [f for f in os.listdir(migrations_path) if f.endswith(".sql")]
+# Key of the advisory lock that serializes concurrent runners
+MIGRATION_LOCK_KEY = 5_170_001
 
-    for sql_file in sql_files:
-        sql_file_path = os.path.join(migrations_path, sql_file)
+# Migration files are named <version>_<description>.sql
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# A migration whose first line is this directive runs statement by statement
+# in autocommit mode, which CREATE INDEX CONCURRENTLY requires
+NO_TRANSACTION_DIRECTIVE = "-- migrate:no-transaction"
+CONCURRENTLY = re.compile(r"\bCONCURRENTLY\b", re.IGNORECASE)
+CREATE_INDEX_CONCURRENTLY = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"(\"[^\"]+\"|\w+)",
+    re.IGNORECASE,
+)
+DOLLAR_QUOTE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
 
-        try:
-            with open(sql_file_path, "r") as file:
-                sql_content = file.read()
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        execution_ms INT NOT NULL,
+        applied_at TIMESTAMP DEFAULT now() NOT NULL
+    )
+"""
 
-            await connection.execute(sql_content)
-            logger.info(f"Executed {sql_file} successfully")
-        except Exception as e:
-            logger.error(f"Error executing {sql_file}: {e}")
-            raise e
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+    checksum: str
+    transactional: bool
+
+
+class AppliedMigration(NamedTuple):
+    version: int
+    name: str
+    checksum: str
+
+
+class MigrationPlan(NamedTuple):
+    pending: List[Migration]
+    # Applied migrations whose file has been edited since
+    changed: List[Migration]
+    # Applied migrations whose file no longer exists
+    missing: List[AppliedMigration]
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Split a script into its statements, dropping comments. Semicolons inside
+    quoted strings, quoted identifiers and dollar-quoted bodies are kept.
+
+    Args:
+        sql: The SQL script
+
+    Returns:
+        The statements, without their terminating semicolons
+    """
+    statements = []
+    current: List[str] = []
+    i, n = 0, len(sql)
+
+    def flush() -> None:
+        statement = "".join(current).strip()
+        if statement:
+            statements.append(statement)
+        current.clear()
+
+    while i < n:
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            current.append(" ")
+            continue
+
+        char = sql[i]
+        if char in "'\"":
+            end = i + 1
+            while True:
+                end = sql.find(char, end)
+                if end < 0:
+                    end = n
+                    break
+                # A doubled quote is an escaped one
+                if sql.startswith(char * 2, end):
+                    end += 2
+                    continue
+                end += 1
+                break
+            current.append(sql[i:end])
+            i = end
+            continue
+        if char == "$":
+            match = DOLLAR_QUOTE.match(sql, i)
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, match.end())
+                end = n if end < 0 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+                continue
+        if char == ";":
+            flush()
+        else:
+            current.append(char)
+        i += 1
+
+    flush()
+    return statements
+
+
+def load_migrations(path: str = MIGRATIONS_PATH) -> List[Migration]:
+    """
+    Read the migration files in version order.
+
+    Raises:
+        MigrationError: If a file is misnamed, two files share a version, or a
+            transactional migration uses CREATE INDEX CONCURRENTLY
+    """
+    migrations = {}
+    for filename in os.listdir(path):
+        if not filename.endswith(".sql"):
+            continue
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            raise MigrationError(
+                f"Migration {filename} must be named <version>_<description>.sql"
+            )
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(
+                f"Migrations {migrations[version].name} and {filename} share version {version}"
+            )
+
+        with open(os.path.join(path, filename), "r") as file:
+            # Line endings are normalized so that the checksum does not depend
+            # on the checkout
+            sql = file.read().replace("\r\n", "\n")
+        transactional = not sql.lstrip().startswith(NO_TRANSACTION_DIRECTIVE)
+        if transactional and any(
+            CONCURRENTLY.search(statement) for statement in split_statements(sql)
+        ):
+            raise MigrationError(
+                f"Migration {filename} uses CONCURRENTLY and must start with "
+                f"'{NO_TRANSACTION_DIRECTIVE}'"
+            )
+
+        migrations[version] = Migration(
+            version,
+            filename,
+            sql,
+            hashlib.sha256(sql.encode()).hexdigest(),
+            transactional,
+        )
+
+    return [migrations[version] for version in sorted(migrations)]
+
+
+async def plan_migrations(
+    connection: Connection, migrations: Optional[List[Migration]] = None
+) -> MigrationPlan:
+    """
+    Compare the migration files with the ones recorded in schema_migrations.
+
+    Args:
+        connection: The database connection
+        migrations: The migration files, read from MIGRATIONS_PATH if omitted
+
+    Returns:
+        The pending, edited and missing migrations
+    """
+    if migrations is None:
+        migrations = load_migrations()
+
+    exists = await connection.fetchval(
+        "SELECT to_regclass('schema_migrations') IS NOT NULL"
+    )
+    rows = (
+        await connection.fetch(
+            "SELECT version, name, checksum FROM schema_migrations ORDER BY version"
+        )
+        if exists
+        else []
+    )
+    applied = {
+        row["version"]: AppliedMigration(row["version"], row["name"], row["checksum"])
+        for row in rows
+    }
+    versions = {migration.version for migration in migrations}
+
+    return MigrationPlan(
+        pending=[
+            migration for migration in migrations if migration.version not in applied
+        ],
+        changed=[
+            migration
+            for migration in migrations
+            if migration.version in applied
+            and applied[migration.version].checksum != migration.checksum
+        ],
+        missing=[
+            migration
+            for version, migration in applied.items()
+            if version not in versions
+        ],
+    )
+
+
+async def _set_lock_timeout(connection: Connection, local: bool) -> None:
+    if MIGRATION_LOCK_TIMEOUT:
+        await connection.execute(
+            "SELECT set_config('lock_timeout', $1, $2)", MIGRATION_LOCK_TIMEOUT, local
+        )
+
+
+async def _index_is_invalid(connection: Connection, index: str) -> bool:
+    return bool(
+        await connection.fetchval(
+            """
+            SELECT NOT indisvalid FROM pg_index
+            WHERE indexrelid = to_regclass($1)
+            """,
+            index,
+        )
+    )
+
+
+async def _apply(connection: Connection, migration: Migration) -> None:
+    started = time.perf_counter()
+
+    async def record() -> None:
+        await connection.execute(
+            """
+            INSERT INTO schema_migrations(version, name, checksum, execution_ms)
+            VALUES ($1, $2, $3, $4)
+            """,
+            migration.version,
+            migration.name,
+            migration.checksum,
+            int((time.perf_counter() - started) * 1000),
+        )
+
+    if migration.transactional:
+        async with connection.transaction():
+            await _set_lock_timeout(connection, local=True)
+            await connection.execute(migration.sql)
+            await record()
+        return
+
+    # Every statement commits on its own. If one fails, the ones before it
+    # stay applied and the migration is not recorded, so its statements must
+    # be safe to run again (IF NOT EXISTS). A failed CREATE INDEX CONCURRENTLY
+    # leaves an INVALID index behind that IF NOT EXISTS would skip, so it is
+    # dropped before the statement runs and checked for again afterwards.
+    built_indexes = []
+    await _set_lock_timeout(connection, local=False)
+    try:
+        for statement in split_statements(migration.sql):
+            match = CREATE_INDEX_CONCURRENTLY.match(statement)
+            if match:
+                index = match.group(1)
+                if await _index_is_invalid(connection, index):
+                    logger.warning(
+                        f"Dropping invalid index {index} left by an earlier run of {migration.name}"
+                    )
+                    await connection.execute(
+                        f"DROP INDEX CONCURRENTLY IF EXISTS {index}"
+                    )
+                built_indexes.append(index)
+            await connection.execute(statement)
+    finally:
+        await connection.execute("RESET lock_timeout")
+
+    invalid = [
+        index for index in built_indexes if await _index_is_invalid(connection, index)
+    ]
+    if invalid:
+        raise MigrationError(
+            f"Migration {migration.name} left invalid indexes: {', '.join(invalid)}"
+        )
+    await record()
+
+
+async def run_migrations(
+    connection: Connection, dry_run: bool = False
+) -> MigrationPlan:
+    """
+    Apply the pending migrations in version order, each in its own
+    transaction unless it opts out, recording them in schema_migrations.
+    Concurrent runners wait on an advisory lock, so every migration runs once.
+
+    Args:
+        connection: The database connection
+        dry_run: Only compute and log the plan
+
+    Returns:
+        The plan the run started from
+
+    Raises:
+        MigrationError: If an applied migration has been edited since
+    """
+    migrations = load_migrations()
+    await connection.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+    try:
+        if not dry_run:
+            await connection.execute(CREATE_MIGRATIONS_TABLE)
+        plan = await plan_migrations(connection, migrations)
+
+        for migration in plan.missing:
+            logger.warning(
+                f"Applied migration {migration.name} no longer has a migration file"
+            )
+        if plan.changed:
+            names = ", ".join(migration.name for migration in plan.changed)
+            logger.error(f"Applied migrations have been edited since: {names}")
+            raise MigrationError(
+                f"Applied migrations have been edited since: {names}. "
+                "Add a new migration instead of changing an applied one"
+            )
+
+        if not plan.pending:
+            logger.info("Database schema is up to date")
+        for migration in plan.pending:
+            mode = "" if migration.transactional else " (no transaction)"
+            if dry_run:
+                logger.info(f"Pending migration {migration.name}{mode}")
+                continue
+
+            try:
+                await _apply(connection, migration)
+                logger.info(f"Applied migration {migration.name}{mode}")
+            except Exception as e:
+                logger.error(f"Error applying migration {migration.name}: {e}")
+                raise e
+
+        return plan
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+
+async def main(dry_run: bool) -> None:
+    connection = await get_db_connection()
+    try:
+        await run_migrations(connection, dry_run=dry_run)
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending database migrations")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="List pending migrations only"
+    )
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.dry_run))
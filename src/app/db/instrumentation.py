@@ -0,0 +1,212 @@
+import contextvars
+import functools
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+
+from app.utils.logger import logger
+from app.utils.metrics import Histogram, registry
+
+# Statements slower than this many milliseconds are logged as warnings;
+# 0 disables the slow query log
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# Distinct normalized statements tracked; later ones are aggregated together
+DB_QUERY_STATS_MAX_STATEMENTS = int(os.getenv("DB_QUERY_STATS_MAX_STATEMENTS", "500"))
+# Add the database round trips and time of each request to its response
+# headers, to spot handlers that query in a loop
+DB_DEBUG_HEADERS = os.getenv("DB_DEBUG_HEADERS", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+OTHER_STATEMENTS = "<other>"
+
+_WHITESPACE = re.compile(r"\s+")
+# String and numeric literals, but not the digits of $1-style parameters
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w$])\d+(?:\.\d+)?\b")
+
+DB_QUERY_DURATION = registry.register(
+    Histogram("db_query_duration_seconds", "Time taken by database statements")
+)
+DB_ROUND_TRIPS = registry.register(
+    Histogram(
+        "db_round_trips_per_request",
+        "Database statements issued while handling an HTTP request",
+        buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+    )
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    """
+    Reduce a statement to its shape, so that statements differing only in
+    whitespace or inlined literals are aggregated together.
+    """
+    return _LITERALS.sub("?", _WHITESPACE.sub(" ", query).strip())
+
+
+class StatementStats:
+    __slots__ = ("calls", "total_seconds", "max_seconds", "rows")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+
+class RequestQueries:
+    """Database round trips made while handling one request."""
+
+    __slots__ = ("round_trips", "seconds")
+
+    def __init__(self):
+        self.round_trips = 0
+        self.seconds = 0.0
+
+
+class QueryStats:
+    """Per-statement totals since the process started, by normalized SQL."""
+
+    def __init__(self, max_statements: int = DB_QUERY_STATS_MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self.statements: Dict[str, StatementStats] = {}
+
+    def record(self, query: str, seconds: float, rows: int) -> None:
+        statement = normalize_sql(query)
+        stats = self.statements.get(statement)
+        if stats is None:
+            if len(self.statements) >= self.max_statements:
+                statement = OTHER_STATEMENTS
+            stats = self.statements.setdefault(statement, StatementStats())
+        stats.calls += 1
+        stats.total_seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        stats.rows += rows
+
+        DB_QUERY_DURATION.observe(seconds)
+        request = current_request.get()
+        if request is not None:
+            request.round_trips += 1
+            request.seconds += seconds
+        if DB_SLOW_QUERY_MS and seconds * 1000 >= DB_SLOW_QUERY_MS:
+            logger.warning(
+                f"Slow query ({seconds * 1000:.1f} ms, {rows} rows): {statement}"
+            )
+
+    def top(self, limit: int) -> List[Tuple[str, StatementStats]]:
+        """The statements that took the most time in total, slowest first."""
+        return sorted(
+            self.statements.items(),
+            key=lambda item: item[1].total_seconds,
+            reverse=True,
+        )[:limit]
+
+    def clear(self) -> None:
+        self.statements.clear()
+
+
+query_stats = QueryStats()
+current_request: contextvars.ContextVar[Optional[RequestQueries]] = (
+    contextvars.ContextVar("current_request", default=None)
+)
+
+
+def _status_rows(status: str) -> int:
+    # Command tags end in the affected row count, e.g. "UPDATE 3"
+    count = status.rsplit(" ", 1)[-1]
+    return int(count) if count.isdigit() else 0
+
+
+class _Timer:
+    __slots__ = ("query", "rows", "started")
+
+    def __init__(self, query: str):
+        self.query = query
+        self.rows = 0
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        query_stats.record(self.query, time.perf_counter() - self.started, self.rows)
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    """
+    Connection class for the pool that times every statement issued through
+    the query methods and records it in query_stats.
+    """
+
+    async def fetch(self, query, *args, **kwargs):
+        with _Timer(query) as timer:
+            rows = await super().fetch(query, *args, **kwargs)
+            timer.rows = len(rows)
+            return rows
+
+    async def fetchrow(self, query, *args, **kwargs):
+        with _Timer(query) as timer:
+            row = await super().fetchrow(query, *args, **kwargs)
+            timer.rows = 0 if row is None else 1
+            return row
+
+    async def fetchval(self, query, *args, **kwargs):
+        with _Timer(query) as timer:
+            value = await super().fetchval(query, *args, **kwargs)
+            timer.rows = 0 if value is None else 1
+            return value
+
+    async def fetchmany(self, query, args, **kwargs):
+        with _Timer(query) as timer:
+            rows = await super().fetchmany(query, args, **kwargs)
+            timer.rows = len(rows)
+            return rows
+
+    async def execute(self, query, *args, **kwargs):
+        with _Timer(query) as timer:
+            status = await super().execute(query, *args, **kwargs)
+            timer.rows = _status_rows(status)
+            return status
+
+    async def executemany(self, command, args, **kwargs):
+        with _Timer(command):
+            return await super().executemany(command, args, **kwargs)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware counting the database round trips of each request. With
+    DB_DEBUG_HEADERS set, they are added to the response as X-DB-Round-Trips
+    and X-DB-Time-Ms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestQueries()
+        token = current_request.set(request)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and DB_DEBUG_HEADERS:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-round-trips", str(request.round_trips).encode()),
+                    (b"x-db-time-ms", f"{request.seconds * 1000:.1f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_request.reset(token)
+            DB_ROUND_TRIPS.observe(request.round_trips)
@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS users (
+    id uuid PRIMARY KEY,
+    email VARCHAR(100) UNIQUE,
+    phone_number VARCHAR(15) UNIQUE NOT NULL,
+    password_hash VARCHAR(128) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    role VARCHAR(20) DEFAULT 'user' CHECK (role IN ('admin', 'user')),
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now(),
+    date_of_birth DATE NOT NULL
+)
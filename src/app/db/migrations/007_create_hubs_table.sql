@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS hubs (
+    station_id uuid NOT NULL,
+    route1_id uuid NOT NULL,
+    route2_id uuid,
+    CONSTRAINT fk_hub_station FOREIGN KEY (station_id) REFERENCES stations(station_id) ON DELETE CASCADE,
+    CONSTRAINT fk_hub_route1 FOREIGN KEY (route1_id) REFERENCES routes(route_id) ON DELETE CASCADE,
+    CONSTRAINT fk_hub_route2 FOREIGN KEY (route2_id) REFERENCES routes(route_id) ON DELETE CASCADE
+)
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS ticket_price (
+    station1_id uuid NOT NULL,
+    station2_id uuid NOT NULL,
+    price INT NOT NULL,
+    CONSTRAINT fk_price_station1 FOREIGN KEY (station1_id) REFERENCES stations(station_id) ON DELETE CASCADE,
+    CONSTRAINT fk_price_station2 FOREIGN KEY (station2_id) REFERENCES stations(station_id) ON DELETE CASCADE
+)
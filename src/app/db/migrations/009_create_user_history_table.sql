@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS user_history (
+    id uuid PRIMARY KEY,
+    user_id uuid NOT NULL,
+    action VARCHAR(50) NOT NULL,
+    date TIMESTAMP DEFAULT now() NOT NULL,
+    details TEXT NOT NULL,
+    CONSTRAINT fk_user_history FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+)
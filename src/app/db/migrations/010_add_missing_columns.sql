@@ -0,0 +1,6 @@
+-- Columns the application reads that the original table definitions lack
+ALTER TABLE stations
+    ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'active' NOT NULL;
+
+ALTER TABLE routes_stations
+    ADD COLUMN IF NOT EXISTS ticket_price INT;
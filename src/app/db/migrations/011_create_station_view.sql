@@ -0,0 +1,4 @@
+CREATE OR REPLACE VIEW station_view AS
+    SELECT station_id, station_name, location, status
+    FROM stations
+    ORDER BY status, location, station_name
@@ -0,0 +1,46 @@
+-- Store every fare once, as an ordered (least, greatest) station pair, so
+-- that a fare lookup is a single probe of the unique pair index
+
+-- A pair stored in both orientations with different prices has no right
+-- answer to keep, so the migration stops and lists those pairs; delete the
+-- wrong row of each by hand, then run the migrations again
+DO $$
+DECLARE
+    conflicts text;
+BEGIN
+    SELECT string_agg(format('(%s, %s): %s', pair_start, pair_end, prices), '; ')
+        INTO conflicts
+        FROM (
+            SELECT least(station1_id, station2_id) AS pair_start,
+                greatest(station1_id, station2_id) AS pair_end,
+                string_agg(DISTINCT price::text, ', ') AS prices
+            FROM ticket_price
+            GROUP BY 1, 2
+            HAVING count(DISTINCT price) > 1
+        ) conflicting;
+
+    IF conflicts IS NOT NULL THEN
+        RAISE EXCEPTION 'ticket_price has different prices for the same station pair: %', conflicts
+            USING HINT = 'Delete the wrong row of each pair, then run the migrations again';
+    END IF;
+END
+$$;
+
+-- Only exact duplicates are left, so which copy is kept does not matter
+DELETE FROM ticket_price a
+    USING ticket_price b
+    WHERE least(a.station1_id, a.station2_id) = least(b.station1_id, b.station2_id)
+        AND greatest(a.station1_id, a.station2_id) = greatest(b.station1_id, b.station2_id)
+        AND a.price = b.price
+        AND a.ctid > b.ctid;
+
+UPDATE ticket_price
+    SET station1_id = station2_id, station2_id = station1_id
+    WHERE station1_id > station2_id;
+
+ALTER TABLE ticket_price DROP CONSTRAINT IF EXISTS ticket_price_ordered_pair;
+ALTER TABLE ticket_price
+    ADD CONSTRAINT ticket_price_ordered_pair CHECK (station1_id <= station2_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ticket_price_pair_idx
+    ON ticket_price (station1_id, station2_id);
@@ -0,0 +1,36 @@
+-- migrate:no-transaction
+-- Secondary indexes for the lookups made on every hot request path, built
+-- without blocking writes to the tables
+
+-- Ordered stops of a route (route details, metadata index loads)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS routes_stations_route_stop_idx
+    ON routes_stations (route_id, stop_int);
+
+-- Routes serving a station (hub connections, segment route lookup and
+-- cascading station deletes)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS routes_stations_station_idx
+    ON routes_stations (station_id);
+
+-- Fares of a station as the greater id of the pair; the unique
+-- ticket_price_pair_idx already covers lookups by station1_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ticket_price_station2_idx
+    ON ticket_price (station2_id);
+
+-- Trains of a route (cascading route deletes)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS trains_route_idx
+    ON trains (route_id);
+
+-- Sign-in, sign-up and profile uniqueness checks. The names match the
+-- indexes behind the UNIQUE constraints, so existing ones are kept
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS users_phone_number_key
+    ON users (phone_number);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS users_email_key
+    ON users (email);
+
+-- Wallet of a user (user listings and profile)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS wallets_user_idx
+    ON wallets (user_id);
+
+-- Latest history entries of a user
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_history_user_date_idx
+    ON user_history (user_id, date DESC);
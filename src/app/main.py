@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 from collections import defaultdict
 from contextlib import asynccontextmanager
@@ -6,13 +7,16 @@ from typing import Any, Dict, List, Optional, Set, Tuple
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.db.connection import get_db_connection
-from app.db.init_db import create_tables
+from app.db.connection import close_db_pool, get_db_pool, init_db_pool
+from app.db.init_db import MIGRATE_ON_STARTUP, run_migrations
+from app.db.instrumentation import QueryStatsMiddleware
 from app.routes.add_route import router as add_route_router
 from app.routes.add_station import router as add_station_router
 from app.routes.add_stop import router as add_stop_router
 from app.routes.add_train import router as add_train_router
 from app.routes.calculate_fare import router as calculate_fare_router
+from app.routes.db_queries import router as db_queries_router
+from app.routes.debug_profile import router as debug_profile_router
 from app.routes.delete_route import router as delete_route_router
 from app.routes.delete_station import router as delete_station_router
 from app.routes.delete_stop import router as delete_stop_router
@@ -21,12 +25,15 @@ from app.routes.delete_user import router as delete_user_router
 from app.routes.get_dashboard_metrics import router as get_dashboard_metrics_router
 from app.routes.get_routes import router as get_routes_router
 from app.routes.get_routes_by_route_id import router as get_routes_by_route_id_router
+from app.routes.get_station_fares import router as get_station_fares_router
 from app.routes.get_stations import router as get_stations_router
 from app.routes.get_stations_tickets import router as get_stations_tickets_router
 from app.routes.get_trains import router as get_trains_router
 from app.routes.get_user_history import router as get_user_history_router
 from app.routes.get_users import router as get_users_router
 from app.routes.get_users_by_user_id import router as get_users_by_user_id_router
+from app.routes.graph_status import router as graph_status_router
+from app.routes.metrics import router as metrics_router
 from app.routes.routes_stations import router as count_stations_router
 from app.routes.signin import router as signin_router
 from app.routes.signup import router as signup_router
@@ -37,25 +44,50 @@ from app.routes.update_stop import router as update_stop_router
 from app.routes.update_train import router as update_train_router
 from app.routes.update_user import router as update_user_router
 from app.routes.user_demographics import router as user_demographics_router
-from app.utils.graph import WeightedGraph, graph
+from app.utils.auth import check_auth_config
+from app.utils.graph import WeightedGraph, graph, metadata
+from app.utils.graph_builder import (
+    GRAPH_FRESHNESS_INTERVAL,
+    load_graph,
+    watch_graph_freshness,
+)
 from app.utils.logger import logger
+from app.utils.metrics import MetricsMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    check_auth_config()
     logger.info("Starting up... Connecting to the database.")
-    connection = await get_db_connection()
+    await init_db_pool()
     global graph
     try:
-        logger.info("Creating tables...")
-        graph = await build_graph(graph)
-        # await create_tables(connection)
-    finally:
-        await connection.close()
-        logger.info("Database connection closed")
+        if MIGRATE_ON_STARTUP:
+            async with get_db_pool().acquire() as connection:
+                await run_migrations(connection)
+        await load_graph(graph)
+        async with get_db_pool().acquire() as connection:
+            await metadata.load(connection)
+        logger.info(
+            f"Metadata index loaded with {len(metadata.stations)} stations and {len(metadata.routes)} routes"
+        )
+    except Exception:
+        await close_db_pool()
+        raise
+
+    # Other workers' mutations only reach this one through the database
+    freshness_task = (
+        asyncio.create_task(watch_graph_freshness())
+        if GRAPH_FRESHNESS_INTERVAL > 0
+        else None
+    )
 
     yield
 
+    if freshness_task is not None:
+        freshness_task.cancel()
+    await close_db_pool()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -67,10 +99,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+# Added last so that it wraps every other middleware
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(get_users_router, prefix="", tags=["Users"])
 app.include_router(get_stations_router, prefix="", tags=["Stations"])
 app.include_router(get_stations_tickets_router, prefix="", tags=["Stations", "Tickets"])
+app.include_router(get_station_fares_router, prefix="", tags=["Stations", "Tickets"])
 app.include_router(get_routes_router, prefix="", tags=["Routes"])
 app.include_router(get_routes_by_route_id_router, prefix="", tags=["Routes"])
 app.include_router(get_trains_router, prefix="", tags=["Trains"])
@@ -97,6 +133,10 @@ app.include_router(update_train_router, prefix="", tags=["Trains"])
 app.include_router(delete_train_router, prefix="", tags={"Trains"})
 app.include_router(user_demographics_router, prefix="", tags=["Users"])
 app.include_router(count_stations_router, prefix="", tags=["Routes", "Stations"])
+app.include_router(graph_status_router, prefix="", tags=["Diagnostics"])
+app.include_router(metrics_router, prefix="", tags=["Diagnostics"])
+app.include_router(db_queries_router, prefix="", tags=["Diagnostics"])
+app.include_router(debug_profile_router, prefix="", tags=["Diagnostics"])
 
 
 @app.get("/")
@@ -107,85 +147,8 @@ async def root():
 @app.get("/test-db")
 async def test_db():
     try:
-        conn = await get_db_connection()
-        try:
+        async with get_db_pool().acquire() as conn:
             result = await conn.fetch("SELECT NOW() as current_time")
             return {"status": "success", "data": result}
-        finally:
-            await conn.close()
     except Exception as e:
         return {"status": "error", "message": str(e)}
-
-
-async def build_graph(graph: WeightedGraph) -> WeightedGraph:
-    try:
-        conn = await get_db_connection()
-
-        rows = await conn.fetch(
-            """
-            SELECT * FROM hubs
-            """
-        )
-
-        for row in rows:
-            # Convert asyncpg UUID to Python's standard UUID
-            station_id = uuid.UUID(str(row["station_id"]))
-            graph.add_node(station_id)
-
-            route1_id = row["route1_id"]
-            route2_id = row["route2_id"]
-            connected_stations = await conn.fetch(
-                """
-                SELECT station_id FROM routes_stations WHERE route_id = $1 OR route_id = $2
-                """,
-                route1_id,
-                route2_id,
-            )
-
-            logger.info(connected_stations)
-
-            for station in connected_stations:
-                # Convert asyncpg UUID to Python's standard UUID
-                connected_station_id = uuid.UUID(str(station["station_id"]))
-                graph.add_node(connected_station_id)
-                logger.info(connected_station_id)
-
-                price = await conn.fetch(
-                    """
-                    SELECT price FROM ticket_price
-                    WHERE (station1_id = $1 AND station2_id = $2)
-                        OR (station1_id = $2 AND station2_id = $1)
-                    """,
-                    str(station_id),  # Convert UUID to string for SQL
-                    str(connected_station_id),  # Convert UUID to string for SQL
-                )
-
-                if price and len(price) > 0:
-                    # Check if price result exists and has at least one row
-                    price_value = price[0][
-                        "price"
-                    ]  # Access first row and 'price' column
-                    graph.add_bidirectional_edge(
-                        station_id, connected_station_id, price_value
-                    )
-                else:
-                    # Handle case where no price is found - you might want to set a default or log a warning
-                    logger.warning(
-                        f"No price found between stations {station_id} and {connected_station_id}"
-                    )
-                    # Optionally add edge with default price (e.g., 0.0) or skip adding this edge
-                    # graph.add_edge(station_id, connected_station_id, 0.0)
-
-        logger.info(
-            f"Graph built successfully with {graph.get_node_count()} nodes and {graph.get_edge_count()} edges"
-        )
-        logger.info(f"{str(graph)}")
-        logger.debug(str(graph))
-
-        # Optionally return the graph if needed elsewhere
-        return graph
-
-    except Exception as e:
-        logger.error(f"Error building graph: {str(e)}")
-        # Re-raise or return None depending on how you want to handle failures
-        raise
@@ -10,9 +10,8 @@ class AddRouteRequest(BaseModel):
 
 
 @router.post("/add_route")
-async def add_route(route_data: AddRouteRequest):
+async def add_route(route_data: AddRouteRequest, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         route_id = uuid.uuid4()
         start_station_id = uuid.UUID(route_data.start_station_id)
         end_station_id = uuid.UUID(route_data.end_station_id)
@@ -35,6 +34,7 @@ async def add_route(route_data: AddRouteRequest):
             start_station_id,
             1,
         )
+        await metadata.refresh_route(conn, route_id)
 
         return {
             "message": "Add Route Successful",
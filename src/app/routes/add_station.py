@@ -9,9 +9,8 @@ class AddStationRequest(BaseModel):
 
 
 @router.post("/add_station")
-async def add_station(form_data: AddStationRequest):
+async def add_station(form_data: AddStationRequest, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         station_id = uuid.uuid4()
         await conn.execute(
             """
@@ -21,6 +20,7 @@ async def add_station(form_data: AddStationRequest):
             form_data.name,
             form_data.location,
         )
+        await metadata.refresh_station(conn, station_id)
         return {
             "message": f"Successfully added {form_data.name} Station at {form_data.location}",
             "station_id": station_id,
@@ -1,4 +1,5 @@
 from app.routes.common_imports import *
+from app.utils.graph_builder import refresh_graph_nodes
 
 router = APIRouter()
 
@@ -10,9 +11,8 @@ class RouteStopRequest(BaseModel):
 
 
 @router.post("/add_stop")
-async def add_stop(stop_data: RouteStopRequest):
+async def add_stop(stop_data: RouteStopRequest, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         route_id = uuid.UUID(stop_data.route_id)
         station_id = uuid.UUID(stop_data.station_id)
         stop_int = int(stop_data.stop_int)
@@ -25,6 +25,8 @@ async def add_stop(stop_data: RouteStopRequest):
                 station_id,
                 stop_int,
             )
+            await metadata.refresh_route(conn, route_id)
+            await refresh_graph_nodes(conn, [station_id])
         except Exception as e:
             logger.error(f"Failed to add stop: {e}")
 
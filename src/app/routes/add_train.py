@@ -11,9 +11,8 @@ class AddTrainRequest(BaseModel):
 
 
 @router.post("/add_train")
-async def add_train(train_data: AddTrainRequest):
+async def add_train(train_data: AddTrainRequest, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         train_id = uuid.uuid4()
         route_id = uuid.UUID(train_data.route_id)
         capacity = int(train_data.capacity)
@@ -1,11 +1,31 @@
 import heapq
 from collections import defaultdict
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
 
+from asyncpg import Record
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+
+from app.db.connection import get_db_pool
 from app.routes.common_imports import *
+from app.utils.fare_matrix import fare_matrix
+from app.utils.graph import CompactGraph, GraphSnapshot, snapshots
+from app.utils.journey_cache import journey_cache
+from app.utils.journey_planner import Journey, plan_journeys
+from app.utils.route_search import (
+    LandmarkIndex,
+    find_path,
+    k_shortest_paths,
+    landmarks,
+)
 
 router = APIRouter()
 
+# Most alternatives /calculate-fare/alternatives returns per request
+MAX_ALTERNATIVES = 10
+# Most origin-destination pairs /calculate-fare/batch accepts per request
+MAX_BATCH_PAIRS = 5000
+
 
 class RouteSegment(BaseModel):
     origin_station_name: str
@@ -24,13 +44,57 @@ class JourneyResponse(BaseModel):
     intermediate_stations: Optional[List[str]] = []
     segments: List[RouteSegment] = []
     requires_route_change: bool = False
+    graph_version: Optional[int] = None
+    nodes_settled: Optional[int] = None
+
+
+class FarePair(BaseModel):
+    origin_station_id: uuid.UUID
+    destination_station_id: uuid.UUID
+
+
+class FareBatchRequest(BaseModel):
+    pairs: List[FarePair]
+
+
+class FareBatchResult(BaseModel):
+    # Position of the pair in the request
+    index: int
+    origin_station_id: uuid.UUID
+    destination_station_id: uuid.UUID
+    journey: Optional[JourneyResponse] = None
+    error: Optional[str] = None
+
+
+class JourneyAlternativesResponse(BaseModel):
+    origin_station_name: str
+    destination_station_name: str
+    journeys: List[JourneyResponse] = []
+    graph_version: Optional[int] = None
+
+
+class JourneyOption(BaseModel):
+    total_price: float
+    transfers: int
+    stops: int
+    intermediate_stations: List[str] = []
+    segments: List[RouteSegment] = []
+
+
+class JourneyOptionsResponse(BaseModel):
+    origin_station_name: str
+    destination_station_name: str
+    journeys: List[JourneyOption] = []
+    graph_version: Optional[int] = None
 
 
 # Assuming the WeightedGraph class is already defined as in the provided code
 
 
 def dijkstra(
-    graph: WeightedGraph, start: uuid.UUID, end: Optional[uuid.UUID] = None
+    graph: Union[WeightedGraph, CompactGraph],
+    start: uuid.UUID,
+    end: Optional[uuid.UUID] = None,
 ) -> Tuple[Dict[uuid.UUID, float], Dict[uuid.UUID, Optional[uuid.UUID]]]:
     """
     Implementation of Dijkstra's algorithm to find shortest paths from a start node.
@@ -45,18 +109,22 @@ def dijkstra(
         A tuple containing:
         - distances: Dictionary mapping node UUIDs to their shortest distance from start
         - predecessors: Dictionary mapping node UUIDs to their predecessor in the shortest path
+        Only the nodes reached by the search are included.
     """
     if start not in graph.nodes:
         raise ValueError(f"Start node {start} not in graph")
     if end is not None and end not in graph.nodes:
         raise ValueError(f"End node {end} not in graph")
 
-    # Initialize distances with infinity for all nodes except the start node
-    distances = {node: float("infinity") for node in graph.nodes}
-    distances[start] = 0
+    if isinstance(graph, CompactGraph):
+        return _dijkstra_compact(graph, start, end)
+
+    # Labels are created as nodes are reached, so a search that stops early
+    # only pays for the part of the graph it explored
+    distances = {start: 0}
 
     # Dictionary to keep track of predecessors
-    predecessors = {node: None for node in graph.nodes}
+    predecessors = {start: None}
 
     # Priority queue for nodes to visit next
     # Format: (distance, node_uuid)
@@ -90,7 +158,7 @@ def dijkstra(
             distance = current_distance + weight
 
             # If we found a shorter path to the neighbor
-            if distance < distances[neighbor]:
+            if distance < distances.get(neighbor, float("infinity")):
                 distances[neighbor] = distance
                 predecessors[neighbor] = current_node
 
@@ -100,8 +168,57 @@ def dijkstra(
     return distances, predecessors
 
 
+def _dijkstra_compact(
+    graph: CompactGraph, start: uuid.UUID, end: Optional[uuid.UUID] = None
+) -> Tuple[Dict[uuid.UUID, float], Dict[uuid.UUID, Optional[uuid.UUID]]]:
+    """
+    Dijkstra's algorithm over the dense integer ids of a CompactGraph.
+    Same contract as dijkstra().
+    """
+    infinity = float("infinity")
+    source = graph.index[start]
+    target = graph.index[end] if end is not None else -1
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+    distances = {source: 0.0}
+    predecessors = {source: -1}
+    visited = set()
+
+    priority_queue = [(0.0, source)]
+    while priority_queue:
+        current_distance, current_node = heapq.heappop(priority_queue)
+        if current_node == target:
+            break
+        if current_node in visited:
+            continue
+        visited.add(current_node)
+
+        for k in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[k]
+            if neighbor in visited:
+                continue
+            distance = current_distance + weights[k]
+            if distance < distances.get(neighbor, infinity):
+                distances[neighbor] = distance
+                predecessors[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance, neighbor))
+
+    # Translate dense ids back to UUIDs for the reached nodes only
+    ids = graph.ids
+    return (
+        {ids[node]: distance for node, distance in distances.items()},
+        {
+            ids[node]: ids[predecessor] if predecessor >= 0 else None
+            for node, predecessor in predecessors.items()
+        },
+    )
+
+
 def get_shortest_path(
-    graph: WeightedGraph, start: uuid.UUID, end: uuid.UUID
+    graph: Union[WeightedGraph, CompactGraph],
+    start: uuid.UUID,
+    end: uuid.UUID,
+    landmarks: Optional[LandmarkIndex] = None,
 ) -> Tuple[List[uuid.UUID], float]:
     """
     Find the shortest path between two nodes in a weighted graph.
@@ -110,17 +227,23 @@ def get_shortest_path(
         graph: The weighted graph to traverse
         start: UUID of the starting node
         end: UUID of the target node
+        landmarks: Optional landmark tables for a CompactGraph search
 
     Returns:
         A tuple containing:
         - path: List of node UUIDs representing the shortest path from start to end
         - total_distance: Total distance (sum of weights) of the shortest path
     """
+    # Point-to-point queries on a CompactGraph use the bidirectional search
+    if isinstance(graph, CompactGraph):
+        result = find_path(graph, start, end, landmarks)
+        return result.path, result.distance
+
     # Run Dijkstra's algorithm
     distances, predecessors = dijkstra(graph, start, end)
 
     # If end is not reachable from start
-    if distances[end] == float("infinity"):
+    if distances.get(end, float("infinity")) == float("infinity"):
         return [], float("infinity")
 
     # Reconstruct the path
@@ -138,7 +261,9 @@ def get_shortest_path(
 
 
 def get_all_shortest_paths(
-    graph: WeightedGraph, start: uuid.UUID
+    graph: Union[WeightedGraph, CompactGraph],
+    start: uuid.UUID,
+    targets: Optional[Iterable[uuid.UUID]] = None,
 ) -> Dict[uuid.UUID, Tuple[List[uuid.UUID], float]]:
     """
     Find shortest paths from a start node to all other nodes in the graph.
@@ -146,6 +271,7 @@ def get_all_shortest_paths(
     Args:
         graph: The weighted graph to traverse
         start: UUID of the starting node
+        targets: Optional nodes to reconstruct paths for; defaults to all nodes
 
     Returns:
         Dictionary mapping each node to a tuple containing:
@@ -158,15 +284,15 @@ def get_all_shortest_paths(
     # Dictionary to store results
     result = {}
 
-    # For each node in the graph
-    for node in graph.nodes:
+    # For each node in the graph (or each requested target)
+    for node in graph.nodes if targets is None else targets:
         # Skip the start node
         if node == start:
             result[node] = ([start], 0)
             continue
 
         # If node is not reachable
-        if distances[node] == float("infinity"):
+        if distances.get(node, float("infinity")) == float("infinity"):
             result[node] = ([], float("infinity"))
             continue
 
@@ -186,163 +312,527 @@ def get_all_shortest_paths(
     return result
 
 
+async def fetch_segments(conn: Connection, path: List[uuid.UUID]) -> List[Record]:
+    """
+    Resolve station names, ticket price and route for every edge of a path
+    in a single round trip.
+
+    Args:
+        conn: Database connection
+        path: List of station UUIDs, in travel order
+
+    Returns:
+        One record per consecutive (start, end) pair of the path, in order
+    """
+    return await conn.fetch(
+        """
+        SELECT seg.start_id, seg.end_id,
+            s.station_name AS start_name, e.station_name AS end_name,
+            fare.price, route.route_id, route.route_name
+        FROM unnest($1::uuid[], $2::uuid[]) WITH ORDINALITY AS seg(start_id, end_id, idx)
+            JOIN stations s ON s.station_id = seg.start_id
+            JOIN stations e ON e.station_id = seg.end_id
+            LEFT JOIN LATERAL (
+                SELECT tp.price
+                FROM ticket_price tp
+                WHERE tp.station1_id = least(seg.start_id, seg.end_id)
+                    AND tp.station2_id = greatest(seg.start_id, seg.end_id)
+            ) fare ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT t.route_id, t.route_name
+                FROM routes_stations r
+                    JOIN routes_stations q ON r.route_id = q.route_id
+                    JOIN routes t ON r.route_id = t.route_id
+                WHERE r.station_id = seg.start_id
+                    AND q.station_id = seg.end_id
+                LIMIT 1
+            ) route ON TRUE
+        ORDER BY seg.idx
+        """,
+        path[:-1],
+        path[1:],
+    )
+
+
+def index_segments(
+    path: List[uuid.UUID], prices: List[float]
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Resolve station names and routes for every edge of a path from the
+    in-memory metadata index.
+
+    Args:
+        path: List of station UUIDs, in travel order
+        prices: Ticket price of each edge of the path
+
+    Returns:
+        One dict per edge with the same keys as fetch_segments' records, or
+        None if any station or route is missing from the index
+    """
+    segments = []
+    for start_id, end_id, price in zip(path, path[1:], prices):
+        start = metadata.get_station(start_id)
+        end = metadata.get_station(end_id)
+        route = metadata.find_shared_route(start_id, end_id)
+        if start is None or end is None or route is None or price is None:
+            return None
+        segments.append(
+            {
+                "start_id": start_id,
+                "end_id": end_id,
+                "start_name": start.name,
+                "end_name": end.name,
+                "price": price,
+                "route_id": route.route_id,
+                "route_name": route.name,
+            }
+        )
+    return segments
+
+
+async def build_journey(
+    conn: Connection,
+    path: List[uuid.UUID],
+    prices: List[float],
+    requires_route_change: bool,
+    graph_version: Optional[int],
+    rows: Optional[List[Dict[str, Any]]] = None,
+) -> JourneyResponse:
+    """
+    Describe a path as a journey with named segments.
+
+    Args:
+        conn: Database connection
+        path: List of station UUIDs, in travel order
+        prices: Ticket price of each edge of the path
+        requires_route_change: Whether the path is not a single direct ticket
+        graph_version: Version of the snapshot the path was found in
+        rows: The path's segments if the caller already has them from
+            index_segments
+
+    Returns:
+        The journey
+    """
+    if len(path) < 2:
+        # The origin is the destination, so there is nothing to travel
+        station = metadata.get_station(path[0])
+        name = station.name if station is not None else ""
+        return JourneyResponse(
+            origin_station_name=name,
+            destination_station_name=name,
+            total_price=0,
+            requires_route_change=requires_route_change,
+            graph_version=graph_version,
+        )
+
+    if rows is None:
+        rows = index_segments(path, prices)
+    # Fall back to the database if the index has not caught up yet
+    if rows is None:
+        rows = await fetch_segments(conn, path)
+
+    journey = JourneyResponse(
+        origin_station_name=rows[0]["start_name"],
+        destination_station_name=rows[-1]["end_name"],
+        total_price=sum(row["price"] for row in rows),
+        requires_route_change=requires_route_change,
+        graph_version=graph_version,
+    )
+
+    for i, row in enumerate(rows):
+        segment = RouteSegment(
+            origin_station_name=row["start_name"],
+            destination_station_name=row["end_name"],
+            origin_station_id=row["start_id"],
+            destination_station_id=row["end_id"],
+            route_id=row["route_id"],
+            route_name=row["route_name"],
+            price=row["price"],
+        )
+        journey.segments.append(segment)
+        if i != len(rows) - 1:
+            journey.intermediate_stations.append(row["end_name"])
+
+    return journey
+
+
 @router.get("/calculate-fare", response_model=JourneyResponse)
-async def calculate_fare(origin_station_id: str, destination_station_id: str):
+async def calculate_fare(
+    origin_station_id: str,
+    destination_station_id: str,
+    conn: Connection = Depends(get_db),
+):
     try:
         origin_id = uuid.UUID(origin_station_id)
         destination_id = uuid.UUID(destination_station_id)
 
-        conn = await get_db_connection()
         try:
-            same_route = await conn.fetchrow(
-                """
-                SELECT price
-                FROM ticket_price
-                WHERE (station1_id = $1 AND station2_id = $2)
-                    OR (station1_id = $2 AND station2_id = $1)
-                """,
-                origin_id,
-                destination_id,
-            )
-
-            origin_station_row = await conn.fetchrow(
-                """
-                    SELECT station_name 
-                    FROM stations
-                    WHERE station_id = $1
-                    """,
-                origin_id,
-            )
-            origin_station_name = origin_station_row["station_name"]
-            destination_station_row = await conn.fetchrow(
-                """
-                    SELECT station_name 
-                    FROM stations
-                    WHERE station_id = $1
-                    """,
-                destination_id,
-            )
-            destination_station_name = destination_station_row["station_name"]
-
-            if same_route:
-                logger.info("paisi")
-
-                route = await conn.fetchrow(
-                    """
-                    SELECT t.route_id, t.route_name
-                    FROM routes_stations r
-                        JOIN routes_stations s ON r.route_id = s.route_id
-                        JOIN routes t ON r.route_id = t.route_id
-                    WHERE r.station_id = $1
-                        AND s.station_id = $2
-                    """,
-                    origin_id,
-                    destination_id,
-                )
-                logger.info(origin_id)
-                logger.info(destination_id)
-                route_id = route["route_id"]
-                route_name = route["route_name"]
-                journey = JourneyResponse(
-                    origin_station_name=origin_station_name,
-                    destination_station_name=destination_station_name,
-                    total_price=same_route["price"],
-                )
-                segment = RouteSegment(
-                    origin_station_name=origin_station_name,
-                    destination_station_name=destination_station_name,
-                    origin_station_id=origin_id,
-                    destination_station_id=destination_id,
-                    route_id=route_id,
-                    route_name=route_name,
-                    price=same_route["price"],
-                )
-                journey.segments.append(segment)
-                journey.requires_route_change = False
-                return journey
-            else:
-                logger.info("graph")
-                best_path, best_price = get_shortest_path(
-                    graph=graph, start=origin_id, end=destination_id
-                )
-                journey = JourneyResponse(
-                    origin_station_name=origin_station_name,
-                    destination_station_name=destination_station_name,
-                    total_price=best_price,
-                    requires_route_change=True,
-                )
-
-                for i in range(1, len(best_path)):
-                    start_id = best_path[i - 1]
-                    end_id = best_path[i]
-
-                    price = await conn.fetchrow(
-                        """
-                        SELECT price
-                        FROM ticket_price
-                        WHERE (station1_id = $1 AND station2_id = $2)
-                            OR (station1_id = $2 AND station2_id = $1)
-                        """,
-                        start_id,
-                        end_id,
-                    )
-
-                    start = await conn.fetchrow(
-                        """
-                        SELECT station_name
-                        FROM stations
-                        WHERE station_id = $1
-                        """,
-                        start_id,
+            await metadata.ensure_fresh(conn)
+            # Pin one snapshot for the whole request
+            snapshot = snapshots.current()
+            cache_key = (origin_id, destination_id)
+            cache_version = (snapshot.version, metadata.version)
+            cached = journey_cache.get(cache_key, cache_version)
+            if cached is not None:
+                return cached
+
+            # Try the direct fare first; it only needs a graph search if the
+            # two stations do not share a ticket_price entry
+            direct_price = metadata.get_fare(origin_id, destination_id)
+            requires_route_change = direct_price is None
+            nodes_settled = None
+
+            if requires_route_change:
+                routing_graph = snapshot.graph
+                matrix = fare_matrix.current(routing_graph)
+                if matrix is not None:
+                    best_path, best_price = matrix.get_shortest_path(
+                        origin_id, destination_id
                     )
-                    start_name = start["station_name"]
-                    end = await conn.fetchrow(
-                        """
-                        SELECT station_name
-                        FROM stations
-                        WHERE station_id = $1
-                        """,
-                        end_id,
+                else:
+                    result = find_path(
+                        routing_graph,
+                        origin_id,
+                        destination_id,
+                        landmarks.current(routing_graph),
                     )
-                    end_name = end["station_name"]
-                    route = await conn.fetchrow(
-                        """
-                    SELECT t.route_id, t.route_name
-                    FROM routes_stations r
-                        JOIN routes_stations s ON r.route_id = s.route_id
-                        JOIN routes t ON r.route_id = t.route_id
-                    WHERE r.station_id = $1
-                        AND s.station_id = $2
-                    """,
-                        start_id,
-                        end_id,
+                    best_path, best_price = result.path, result.distance
+                    nodes_settled = result.settled
+                    logger.debug(
+                        "Route search settled %d of %d stations",
+                        nodes_settled,
+                        routing_graph.get_node_count(),
                     )
-                    route_id = route["route_id"]
-                    route_name = route["route_name"]
-                    segment = RouteSegment(
-                        origin_station_name=start_name,
-                        destination_station_name=end_name,
-                        origin_station_id=start_id,
-                        destination_station_id=end_id,
-                        route_id=route_id,
-                        route_name=route_name,
-                        price=price["price"],
+                if not best_path:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="No journey found between the selected stations.",
                     )
-                    journey.segments.append(segment)
-                    if i != len(best_path) - 1:
-                        journey.intermediate_stations.append(end_name)
+                prices = [
+                    routing_graph.get_edge_weight(start_id, end_id)
+                    for start_id, end_id in zip(best_path, best_path[1:])
+                ]
+            else:
+                best_path = [origin_id, destination_id]
+                prices = [direct_price]
 
-                return journey
+            journey = await build_journey(
+                conn, best_path, prices, requires_route_change, snapshot.version
+            )
+            journey.nodes_settled = nodes_settled
+            journey_cache.put(
+                cache_key,
+                cache_version,
+                journey,
+                len(journey.model_dump_json()),
+            )
+            return journey
 
+        except HTTPException as e:
+            raise e
         except Exception as e:
             logger.error(f"Error calculating fare: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error calculating fare. Please try again later.",
             )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error calculating fare: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error calculating fare. Please try again later.",
         )
+
+
+def journey_option(journey: Journey) -> Optional[JourneyOption]:
+    """
+    Describe a planned journey with station and route names from the
+    metadata index.
+
+    Args:
+        journey: The planned journey
+
+    Returns:
+        The response entry, or None if the index is missing a station or route
+    """
+    option = JourneyOption(
+        total_price=journey.fare, transfers=journey.transfers, stops=journey.stops
+    )
+    for i, leg in enumerate(journey.legs):
+        start = metadata.get_station(leg.start_id)
+        end = metadata.get_station(leg.end_id)
+        route = metadata.get_route(leg.route_id)
+        if start is None or end is None or route is None:
+            return None
+        option.segments.append(
+            RouteSegment(
+                origin_station_name=start.name,
+                destination_station_name=end.name,
+                origin_station_id=leg.start_id,
+                destination_station_id=leg.end_id,
+                route_id=leg.route_id,
+                route_name=route.name,
+                price=leg.price,
+            )
+        )
+        if i != len(journey.legs) - 1:
+            option.intermediate_stations.append(end.name)
+    return option
+
+
+@router.get("/calculate-fare/options", response_model=JourneyOptionsResponse)
+async def calculate_fare_options(
+    origin_station_id: uuid.UUID,
+    destination_station_id: uuid.UUID,
+    conn: Connection = Depends(get_db),
+):
+    """
+    Plan every journey worth offering between two stations: the Pareto set
+    over total fare, number of line changes and number of stops.
+    """
+    try:
+        await metadata.ensure_fresh(conn)
+        snapshot = snapshots.current()
+
+        origin = metadata.get_station(origin_station_id)
+        destination = metadata.get_station(destination_station_id)
+        if origin is None or destination is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Station not found.",
+            )
+
+        direct_price = metadata.get_fare(origin_station_id, destination_station_id)
+        journeys = plan_journeys(
+            snapshot.graph,
+            metadata,
+            origin_station_id,
+            destination_station_id,
+            direct_price,
+        )
+
+        options = []
+        for journey in journeys:
+            option = journey_option(journey)
+            if option is None:
+                logger.warning("Skipping journey with stations missing from the index")
+                continue
+            options.append(option)
+        if not options:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No journey found between the selected stations.",
+            )
+
+        return JourneyOptionsResponse(
+            origin_station_name=origin.name,
+            destination_station_name=destination.name,
+            journeys=options,
+            graph_version=snapshot.version,
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error planning journeys: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error planning journeys. Please try again later.",
+        )
+
+
+@router.get("/calculate-fare/alternatives", response_model=JourneyAlternativesResponse)
+async def calculate_fare_alternatives(
+    origin_station_id: uuid.UUID,
+    destination_station_id: uuid.UUID,
+    k: int = Query(5, ge=1, le=MAX_ALTERNATIVES),
+    conn: Connection = Depends(get_db),
+):
+    """
+    Find the k cheapest loopless journeys between two stations.
+    """
+    try:
+        await metadata.ensure_fresh(conn)
+        snapshot = snapshots.current()
+        routing_graph = snapshot.graph
+
+        paths = []
+        if (
+            origin_station_id in routing_graph.nodes
+            and destination_station_id in routing_graph.nodes
+        ):
+            paths = k_shortest_paths(
+                routing_graph, origin_station_id, destination_station_id, k
+            )
+
+        # A direct ticket is a journey too, even between two non-hub stations
+        # the graph has no edge for
+        direct_price = metadata.get_fare(origin_station_id, destination_station_id)
+        direct_path = [origin_station_id, destination_station_id]
+        if direct_price is not None and all(path != direct_path for path, _ in paths):
+            paths.append((direct_path, direct_price))
+            paths.sort(key=lambda item: item[1])
+            paths = paths[:k]
+
+        if not paths:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No journey found between the selected stations.",
+            )
+
+        journeys = []
+        for path, _ in paths:
+            if path == direct_path and direct_price is not None:
+                prices = [direct_price]
+            else:
+                prices = [
+                    routing_graph.get_edge_weight(start_id, end_id)
+                    for start_id, end_id in zip(path, path[1:])
+                ]
+            journeys.append(
+                await build_journey(conn, path, prices, len(path) > 2, snapshot.version)
+            )
+
+        return JourneyAlternativesResponse(
+            origin_station_name=journeys[0].origin_station_name,
+            destination_station_name=journeys[0].destination_station_name,
+            journeys=journeys,
+            graph_version=snapshot.version,
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error finding alternative journeys: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error finding alternative journeys. Please try again later.",
+        )
+
+
+async def stream_fare_batch(
+    pairs: List[FarePair],
+    direct_prices: Dict[int, float],
+    snapshot: GraphSnapshot,
+) -> AsyncIterator[str]:
+    """
+    Quote every pair and yield one FareBatchResult per line as NDJSON.
+    Direct tickets are answered first; the remaining pairs are grouped by
+    origin so that each origin runs a single single-source search.
+
+    Args:
+        pairs: The requested station pairs
+        direct_prices: Direct ticket prices by position in pairs
+        snapshot: The graph snapshot every pair is answered against
+    """
+    routing_graph = snapshot.graph
+    matrix = fare_matrix.current(routing_graph)
+    # Only borrowed if the metadata index cannot name a segment; the
+    # request's own connection is released before the body is streamed
+    fallback_conn = None
+
+    async def result_line(
+        index: int, path: List[uuid.UUID], prices: List[float]
+    ) -> str:
+        nonlocal fallback_conn
+        pair = pairs[index]
+        result = FareBatchResult(
+            index=index,
+            origin_station_id=pair.origin_station_id,
+            destination_station_id=pair.destination_station_id,
+        )
+        if not path:
+            result.error = "No journey found between the selected stations."
+            return result.model_dump_json() + "\n"
+
+        rows = index_segments(path, prices)
+        if rows is None and fallback_conn is None:
+            fallback_conn = await get_db_pool().acquire()
+        result.journey = await build_journey(
+            fallback_conn,
+            path,
+            prices,
+            index not in direct_prices,
+            snapshot.version,
+            rows,
+        )
+        return result.model_dump_json() + "\n"
+
+    try:
+        by_origin: Dict[uuid.UUID, List[int]] = defaultdict(list)
+        for index, pair in enumerate(pairs):
+            if index in direct_prices:
+                yield await result_line(
+                    index,
+                    [pair.origin_station_id, pair.destination_station_id],
+                    [direct_prices[index]],
+                )
+            else:
+                by_origin[pair.origin_station_id].append(index)
+
+        for origin_id, indexes in by_origin.items():
+            destinations = {pairs[index].destination_station_id for index in indexes}
+            if origin_id not in routing_graph.nodes:
+                paths = {}
+            elif matrix is not None:
+                paths = {
+                    destination_id: matrix.get_shortest_path(origin_id, destination_id)
+                    for destination_id in destinations
+                    if destination_id in routing_graph.nodes
+                }
+            else:
+                paths = get_all_shortest_paths(routing_graph, origin_id, destinations)
+
+            for index in indexes:
+                path, _ = paths.get(pairs[index].destination_station_id, ([], None))
+                prices = [
+                    routing_graph.get_edge_weight(start_id, end_id)
+                    for start_id, end_id in zip(path, path[1:])
+                ]
+                yield await result_line(index, path, prices)
+    except Exception as e:
+        # Headers are already sent, so the error can only end the stream
+        logger.error(f"Error streaming fare batch: {str(e)}")
+        raise
+    finally:
+        if fallback_conn is not None:
+            await get_db_pool().release(fallback_conn)
+
+
+@router.post("/calculate-fare/batch")
+async def calculate_fare_batch(
+    request: FareBatchRequest, conn: Connection = Depends(get_db)
+):
+    """
+    Quote many origin-destination pairs in one request. The response is
+    streamed as NDJSON, one FareBatchResult per pair, in no particular order.
+    """
+    if len(request.pairs) > MAX_BATCH_PAIRS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_PAIRS} pairs can be quoted per request.",
+        )
+
+    try:
+        await metadata.ensure_fresh(conn)
+        snapshot = snapshots.current()
+        direct_prices = {}
+        for index, pair in enumerate(request.pairs):
+            price = metadata.get_fare(
+                pair.origin_station_id, pair.destination_station_id
+            )
+            if price is not None:
+                direct_prices[index] = price
+    except Exception as e:
+        logger.error(f"Error calculating fare batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error calculating fares. Please try again later.",
+        )
+
+    return StreamingResponse(
+        stream_fare_batch(request.pairs, direct_prices, snapshot),
+        media_type="application/x-ndjson",
+    )
@@ -1,8 +1,9 @@
 import uuid
 
-from fastapi import APIRouter, HTTPException, status
+from asyncpg import Connection
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
-from app.db.connection import get_db_connection
-from app.utils.graph import WeightedGraph, graph
+from app.db.connection import get_db
+from app.utils.graph import WeightedGraph, graph, metadata
 from app.utils.logger import logger
@@ -0,0 +1,46 @@
+from typing import List
+
+from fastapi import Query
+
+from app.db.instrumentation import query_stats
+from app.routes.common_imports import *
+from app.utils.auth import require_admin
+
+router = APIRouter()
+
+
+class StatementStatsResponse(BaseModel):
+    statement: str
+    calls: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    rows: int
+
+
+@router.get(
+    "/db/queries",
+    response_model=List[StatementStatsResponse],
+    dependencies=[Depends(require_admin)],
+)
+async def get_db_queries(limit: int = Query(20, ge=1, le=500)):
+    return [
+        StatementStatsResponse(
+            statement=statement,
+            calls=stats.calls,
+            total_ms=stats.total_seconds * 1000,
+            mean_ms=stats.total_seconds * 1000 / stats.calls,
+            max_ms=stats.max_seconds * 1000,
+            rows=stats.rows,
+        )
+        for statement, stats in query_stats.top(limit)
+    ]
+
+
+@router.delete(
+    "/db/queries",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_admin)],
+)
+async def reset_db_queries():
+    query_stats.clear()
@@ -0,0 +1,44 @@
+from fastapi import Query
+from fastapi.responses import PlainTextResponse
+
+from app.routes.common_imports import *
+from app.utils.auth import require_admin
+from app.utils.profiler import PROFILER_MAX_SECONDS, ProfileRunningError, profile
+
+router = APIRouter()
+
+
+@router.get(
+    "/debug/profile",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def get_profile(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    tasks: bool = True,
+    idle: bool = False,
+):
+    """
+    Profile the worker serving this request and return the sampled stacks in
+    the collapsed format, ready for flamegraph.pl or speedscope. Only this
+    worker is profiled; behind several workers, repeat the request to reach
+    the others.
+    """
+    try:
+        sampler = await profile(seconds, interval_ms / 1000, tasks, idle)
+    except ProfileRunningError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running on this worker",
+        ) from e
+    except Exception as e:
+        logger.error(f"Profiling failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to profile the worker. Please try again.",
+        ) from e
+
+    return PlainTextResponse(
+        sampler.render(), headers={"X-Profile-Samples": str(sampler.samples)}
+    )
@@ -1,14 +1,17 @@
 from app.routes.common_imports import *
+from app.utils.graph_builder import refresh_graph_nodes
 
 router = APIRouter()
 
 
 @router.delete("/delete_route/{route_id}")
-async def delete_route(route_id: uuid.UUID):
+async def delete_route(route_id: uuid.UUID, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
-
         try:
+            # Stops cascade with the route, so collect them before deleting
+            route = metadata.get_route(route_id)
+            stations = [stop.station_id for stop in route.stops] if route else []
+
             await conn.execute(
                 """
                 DELETE FROM routes
@@ -16,14 +19,14 @@ async def delete_route(route_id: uuid.UUID):
                 """,
                 route_id,
             )
+            await metadata.refresh_route(conn, route_id)
+            await refresh_graph_nodes(conn, stations)
         except Exception as e:
             logger.error(f"Failed to delete route: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Failed to delete route: {str(e)}",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise HTTPException(
@@ -1,13 +1,12 @@
 from app.routes.common_imports import *
+from app.utils.graph_builder import refresh_graph_nodes
 
 router = APIRouter()
 
 
 @router.delete("/delete_station/{station_id}")
-async def delete_station(station_id: uuid.UUID):
+async def delete_station(station_id: uuid.UUID, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
-
         try:
             await conn.execute(
                 """
@@ -16,7 +15,9 @@ async def delete_station(station_id: uuid.UUID):
                 """,
                 station_id,
             )
-            await conn.close()
+            # Routes and stops cascade with the station, so reload everything
+            await metadata.load(conn)
+            await refresh_graph_nodes(conn, [station_id])
             return {"message": f"Successfully deleted station"}
         except Exception as e:
             logger.error(f"Failed to delete station: {str(e)}")
@@ -24,8 +25,6 @@ async def delete_station(station_id: uuid.UUID):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Failed to delete station: {str(e)}",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise HTTPException(
@@ -1,4 +1,5 @@
 from app.routes.common_imports import *
+from app.utils.graph_builder import refresh_graph_nodes
 
 router = APIRouter()
 
@@ -10,10 +11,10 @@ class DeleteStopRequest(BaseModel):
 
 
 @router.delete("/delete_stop")
-async def delete_stop(delete_stop: DeleteStopRequest):
+async def delete_stop(
+    delete_stop: DeleteStopRequest, conn: Connection = Depends(get_db)
+):
     try:
-        conn = await get_db_connection()
-
         try:
             await conn.execute(
                 """
@@ -26,6 +27,8 @@ async def delete_stop(delete_stop: DeleteStopRequest):
                 delete_stop.stop_int,
                 delete_stop.station_id,
             )
+            await metadata.refresh_route(conn, delete_stop.route_id)
+            await refresh_graph_nodes(conn, [delete_stop.station_id])
             return {"message": f"Successfully deleted stop: {delete_stop.stop_int}"}
         except Exception as e:
             logger.error(f"Failed to delete stop: {str(e)}")
@@ -33,8 +36,6 @@ async def delete_stop(delete_stop: DeleteStopRequest):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Failed to delete stop: {str(e)}",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise HTTPException(
@@ -4,10 +4,8 @@ router = APIRouter()
 
 
 @router.delete("/delete_train/{train_id}")
-async def delete_train(train_id: uuid.UUID):
+async def delete_train(train_id: uuid.UUID, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
-
         try:
             await conn.execute(
                 """
@@ -16,7 +14,6 @@ async def delete_train(train_id: uuid.UUID):
                 """,
                 train_id,
             )
-            await conn.close()
             return {"message": f"Successfully deleted train"}
         except Exception as e:
             logger.error(f"Failed to delete train: {str(e)}")
@@ -24,8 +21,6 @@ async def delete_train(train_id: uuid.UUID):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Failed to delete train: {str(e)}",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise HTTPException(
@@ -4,10 +4,8 @@ router = APIRouter()
 
 
 @router.delete("/delete_user/{user_id}")
-async def delete_route(user_id: uuid.UUID):
+async def delete_route(user_id: uuid.UUID, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
-
         try:
             await conn.execute(
                 """
@@ -16,11 +14,9 @@ async def delete_route(user_id: uuid.UUID):
                 """,
                 user_id,
             )
-            await conn.close()
             return {"message": f"Successfully deleted user: {str(user_id)}"}
         except Exception as e:
             logger.error(f"Failed to delete user: {str(e)}")
-            await conn.close()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Failed to delete user: {str(e)}",
@@ -4,13 +4,12 @@ router = APIRouter()
 
 
 @router.get("/dashboard_metrics")
-async def get_dashboard_metrics():
+async def get_dashboard_metrics(conn: Connection = Depends(get_db)):
     """
     Get metrics for the dashboard including counts and statistics.
     This endpoint performs several database queries to calculate key metrics.
     """
     try:
-        conn = await get_db_connection()
         try:
             # Get total counts
             total_stations = await conn.fetchval("SELECT COUNT(*) FROM stations")
@@ -109,8 +108,6 @@ async def get_dashboard_metrics():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch dashboard metrics. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Error connecting to database: {str(e)}")
         raise HTTPException(
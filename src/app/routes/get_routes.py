@@ -24,9 +24,8 @@ class RouteResponse(BaseModel):
 
 
 @router.get("/routes", response_model=list[RouteResponse])
-async def get_routes():
+async def get_routes(conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         try:
             rows = await conn.fetch(
                 """
@@ -54,7 +53,5 @@ async def get_routes():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch stations. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         pass
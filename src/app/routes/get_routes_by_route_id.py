@@ -1,14 +1,51 @@
+from typing import Optional
+
 from app.routes.common_imports import *
 from app.routes.get_routes import RouteResponse, RouteStopResponse
 
 router = APIRouter()
 
 
+def route_from_index(route_id: uuid.UUID) -> Optional[RouteResponse]:
+    route = metadata.get_route(route_id)
+    if route is None:
+        return None
+
+    start_station = metadata.get_station(route.start_station_id)
+    end_station = metadata.get_station(route.end_station_id)
+    stop_stations = [metadata.get_station(stop.station_id) for stop in route.stops]
+    if start_station is None or end_station is None or None in stop_stations:
+        return None
+
+    return RouteResponse(
+        route_id=route_id,
+        route_name=route.name,
+        start_station_id=start_station.station_id,
+        start_station_name=start_station.name,
+        end_station_id=end_station.station_id,
+        end_station_name=end_station.name,
+        stops=[
+            RouteStopResponse(
+                station_id=stop.station_id,
+                station_name=station.name,
+                station_location=station.location,
+                stop_int=stop.stop_int,
+                ticket_price=stop.ticket_price,
+            )
+            for stop, station in zip(route.stops, stop_stations)
+        ],
+    )
+
+
 @router.get("/routes/{route_id}", response_model=RouteResponse)
-async def get_route_details(route_id: uuid.UUID):
+async def get_route_details(route_id: uuid.UUID, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         try:
+            await metadata.ensure_fresh(conn)
+            cached = route_from_index(route_id)
+            if cached is not None:
+                return cached
+
             rows = await conn.fetch(
                 """
                 SELECT r.route_id AS route_id, r.station_id AS station_id, s.station_name AS station_name, s.location AS station_location, r.stop_int AS stop_int, r.ticket_price AS ticket_price
@@ -56,8 +93,6 @@ async def get_route_details(route_id: uuid.UUID):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch stops. Plase try again later",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Error connecting to the database: {str(e)}")
         raise HTTPException(
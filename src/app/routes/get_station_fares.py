@@ -0,0 +1,132 @@
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.routes.calculate_fare import dijkstra
+from app.routes.common_imports import *
+from app.utils.fare_matrix import fare_matrix
+from app.utils.graph import snapshots
+
+router = APIRouter()
+
+# Raw fare rows by origin, valid for one (graph snapshot, metadata) version
+_fare_rows: Dict[uuid.UUID, Dict[uuid.UUID, float]] = {}
+_fare_rows_version: Optional[Tuple[int, int]] = None
+
+
+class StationFaresResponse(BaseModel):
+    origin_station_id: uuid.UUID
+    # Fare to every active station reachable from the origin
+    fares: Dict[uuid.UUID, float]
+
+
+def fare_row(origin_id: uuid.UUID) -> Dict[uuid.UUID, float]:
+    """
+    Compute the fare from one station to every other, as /calculate-fare
+    would quote it: the direct ticket if there is one, else the cheapest
+    path. Direct tickets come from the metadata index's fare mirror. Rows
+    are cached until the next graph snapshot is published or the metadata
+    changes.
+
+    Args:
+        origin_id: UUID of the origin station
+
+    Returns:
+        Fare by destination station UUID, for reachable stations only
+    """
+    global _fare_rows, _fare_rows_version
+    snapshot = snapshots.current()
+    version = (snapshot.version, metadata.version)
+    if _fare_rows_version != version:
+        _fare_rows, _fare_rows_version = {}, version
+    cached = _fare_rows.get(origin_id)
+    if cached is not None:
+        return cached
+
+    routing_graph = snapshot.graph
+    fares: Dict[uuid.UUID, float] = {}
+    if origin_id in routing_graph.nodes:
+        matrix = fare_matrix.current(routing_graph)
+        if matrix is not None:
+            fares = matrix.fares_from(origin_id)
+        else:
+            # One single-source search covers every destination
+            fares, _ = dijkstra(routing_graph, origin_id)
+
+    fares = dict(fares)
+    fares.update(metadata.get_fares_from(origin_id))
+    fares.pop(origin_id, None)
+
+    _fare_rows[origin_id] = fares
+    return fares
+
+
+def etag_for(body: bytes) -> str:
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag. Comparison is weak, as
+    RFC 9110 requires for If-None-Match: a W/ prefix on either side is
+    ignored.
+
+    Args:
+        etag: ETag of the current representation
+        if_none_match: The header value, if the request has one
+
+    Returns:
+        True if the client's cached copy is current
+    """
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+@router.get("/stations/{station_id}/fares", response_model=StationFaresResponse)
+async def get_station_fares(
+    station_id: uuid.UUID, request: Request, conn: Connection = Depends(get_db)
+):
+    """
+    Get the fare from a station to every active station in one response.
+    The ETag is derived from the content, so it is the same on every worker
+    and clients revalidating with If-None-Match get a 304 when unchanged.
+    """
+    try:
+        await metadata.ensure_fresh(conn)
+        if metadata.get_station(station_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Station not found.",
+            )
+
+        fares = fare_row(station_id)
+        active_fares = {}
+        for destination_id, fare in sorted(fares.items()):
+            station = metadata.get_station(destination_id)
+            if station is not None and station.status == "active":
+                active_fares[destination_id] = fare
+        body = StationFaresResponse(
+            origin_station_id=station_id, fares=active_fares
+        ).model_dump_json()
+
+        etag = etag_for(body.encode())
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(etag, request.headers.get("if-none-match")):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error fetching station fares: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch fares. Please try again later.",
+        )
@@ -11,12 +11,11 @@ class StationResponse(BaseModel):
 
 
 @router.get("/stations", response_model=list[StationResponse])
-async def get_stations():
+async def get_stations(conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         try:
             rows = await conn.fetch("SELECT * FROM station_view")
-            logger.info(rows)
+            logger.debug("Fetched %d stations", len(rows))
             stations = [
                 StationResponse(
                     station_id=row["station_id"],
@@ -33,7 +32,5 @@ async def get_stations():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch stations. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         pass
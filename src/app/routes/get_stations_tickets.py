@@ -5,9 +5,8 @@ router = APIRouter()
 
 
 @router.get("/stations_ticket", response_model=list[StationResponse])
-async def get_stations():
+async def get_stations(conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         try:
             rows = await conn.fetch(
                 """
@@ -32,7 +31,5 @@ async def get_stations():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch stations. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         pass
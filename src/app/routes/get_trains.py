@@ -13,9 +13,8 @@ class TrainResponse(BaseModel):
 
 
 @router.get("/trains", response_model=list[TrainResponse])
-async def get_trains():
+async def get_trains(conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         try:
             rows = await conn.fetch(
                 """
@@ -42,7 +41,5 @@ async def get_trains():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch trains. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         pass
@@ -14,9 +14,8 @@ class UserHistoryEntry(BaseModel):
 
 
 @router.get("/users/{user_id}/history", response_model=List[UserHistoryEntry])
-async def get_user_history(user_id: uuid.UUID):
+async def get_user_history(user_id: uuid.UUID, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         try:
             # Check if user exists
             user_exists = await conn.fetchrow(
@@ -60,8 +59,6 @@ async def get_user_history(user_id: uuid.UUID):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch user history. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Error connecting to database: {str(e)}")
         raise HTTPException(
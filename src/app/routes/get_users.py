@@ -18,10 +18,8 @@ router = APIRouter()
 
 
 @router.get("/users")
-async def get_users():
+async def get_users(conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
-
         try:
             rows = await conn.fetch(
                 """
@@ -49,7 +47,5 @@ async def get_users():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error fetching users from database. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         pass
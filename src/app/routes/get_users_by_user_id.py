@@ -18,9 +18,8 @@ class UserDetailResponse(BaseModel):
 
 
 @router.get("/users/{user_id}", response_model=UserDetailResponse)
-async def get_user(user_id: uuid.UUID):
+async def get_user(user_id: uuid.UUID, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         try:
             user = await conn.fetchrow(
                 """
@@ -54,8 +53,6 @@ async def get_user(user_id: uuid.UUID):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch user details. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Error connecting to database: {str(e)}")
         raise HTTPException(
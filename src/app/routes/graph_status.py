@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from app.routes.common_imports import *
+from app.utils.auth import require_admin
+from app.utils.fare_matrix import fare_matrix
+from app.utils.graph import snapshots
+from app.utils.graph_builder import is_rebuilding, schedule_graph_rebuild
+from app.utils.journey_cache import journey_cache
+from app.utils.route_search import landmarks
+
+router = APIRouter()
+
+
+class JourneyCacheStats(BaseModel):
+    enabled: bool
+    entries: int
+    size_bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class GraphStatusResponse(BaseModel):
+    version: int
+    published_at: datetime
+    node_count: int
+    edge_count: int
+    rebuilding: bool
+    fare_matrix_enabled: bool
+    fare_matrix_ready: bool
+    landmarks_ready: bool
+    journey_cache: JourneyCacheStats
+
+
+@router.get("/graph/status", response_model=GraphStatusResponse)
+async def get_graph_status():
+    snapshot = snapshots.current()
+    return GraphStatusResponse(
+        version=snapshot.version,
+        published_at=snapshot.created_at,
+        node_count=snapshot.graph.get_node_count(),
+        edge_count=snapshot.graph.get_edge_count(),
+        rebuilding=is_rebuilding(),
+        fare_matrix_enabled=fare_matrix.enabled,
+        fare_matrix_ready=fare_matrix.current(snapshot.graph) is not None,
+        landmarks_ready=landmarks.index is not None
+        and landmarks.index.graph is snapshot.graph,
+        journey_cache=JourneyCacheStats(
+            enabled=journey_cache.enabled,
+            entries=len(journey_cache),
+            size_bytes=journey_cache.size,
+            max_bytes=journey_cache.max_bytes,
+            hits=journey_cache.hits,
+            misses=journey_cache.misses,
+            evictions=journey_cache.evictions,
+        ),
+    )
+
+
+@router.post(
+    "/graph/rebuild",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin)],
+)
+async def rebuild_graph():
+    started = schedule_graph_rebuild()
+    return {
+        "message": (
+            "Graph rebuild started" if started else "Graph rebuild already running"
+        ),
+        "version": snapshots.current().version,
+    }
@@ -0,0 +1,77 @@
+from fastapi.responses import PlainTextResponse
+
+from app.db import connection
+from app.routes.common_imports import *
+from app.utils.auth import claims_cache
+from app.utils.graph import snapshots
+from app.utils.journey_cache import journey_cache
+from app.utils.logger import queue_handler
+from app.utils.metrics import CallbackMetric, registry
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _pool_connections():
+    pool = connection.pool
+    if pool is None:
+        return {}
+    idle = pool.get_idle_size()
+    return {("idle",): idle, ("busy",): pool.get_size() - idle}
+
+
+for metric in (
+    CallbackMetric(
+        "graph_snapshot_version",
+        "Version of the published fare graph",
+        lambda: snapshots.current().version,
+    ),
+    CallbackMetric(
+        "db_pool_connections",
+        "Open database pool connections",
+        _pool_connections,
+        labelnames=("state",),
+    ),
+    CallbackMetric(
+        "journey_cache_requests_total",
+        "Journey cache lookups",
+        lambda: {("hit",): journey_cache.hits, ("miss",): journey_cache.misses},
+        type="counter",
+        labelnames=("result",),
+    ),
+    CallbackMetric(
+        "journey_cache_evictions_total",
+        "Journeys evicted from the cache to make room",
+        lambda: journey_cache.evictions,
+        type="counter",
+    ),
+    CallbackMetric(
+        "journey_cache_size_bytes",
+        "Estimated size of the cached journeys",
+        lambda: journey_cache.size,
+    ),
+    CallbackMetric(
+        "auth_claims_cache_requests_total",
+        "Token claims cache lookups",
+        lambda: {("hit",): claims_cache.hits, ("miss",): claims_cache.misses},
+        type="counter",
+        labelnames=("result",),
+    ),
+    CallbackMetric(
+        "log_records_discarded_total",
+        "Log records not written",
+        lambda: {
+            ("queue_full",): queue_handler.dropped,
+            ("sampled_out",): queue_handler.sampled_out,
+        },
+        type="counter",
+        labelnames=("reason",),
+    ),
+):
+    registry.register(metric)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
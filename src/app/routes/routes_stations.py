@@ -12,13 +12,12 @@ class RouteStation(BaseModel):
 
 
 @router.get("/routes_stations", response_model=List[RouteStation])
-async def get_routes_stations():
+async def get_routes_stations(conn: Connection = Depends(get_db)):
     """
     Get all routes with their station counts.
     This endpoint returns each route with the number of stations it contains.
     """
     try:
-        conn = await get_db_connection()
         try:
             # Query to count stations per route with route names
             rows = await conn.fetch(
@@ -58,8 +57,6 @@ async def get_routes_stations():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch route station data. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Error connecting to database: {str(e)}")
         raise HTTPException(
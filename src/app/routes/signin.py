@@ -1,16 +1,9 @@
-from datetime import datetime, timedelta, timezone
-from typing import Optional
-
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import Field
 
+from app.db.connection import acquire_db
 from app.routes.common_imports import *
-
-# JWT configuration
-SECRET_KEY = "I love autoshy"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+from app.utils.auth import create_access_token
+from app.utils.passwords import verify_password
 
 
 class TokenResponse(BaseModel):
@@ -23,44 +16,25 @@ class SigninRequest(BaseModel):
     password: str = Field(..., min_length=6)
 
 
-pwd_context = CryptContext(schemes=["bcrypt"])
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(
-            minutes=ACCESS_TOKEN_EXPIRE_MINUTES
-        )
-
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-
 router = APIRouter()
 
 
 @router.post("/signin", response_model=TokenResponse)
 async def signin(form_data: SigninRequest):
     try:
-        conn = await get_db_connection()
-        user = await conn.fetchrow(
-            "SELECT * FROM users WHERE phone_number = $1", form_data.phone
-        )
+        # The connection goes back to the pool before the password check, so
+        # a burst of sign-ins waiting on the hashing pool does not drain it
+        async with acquire_db() as conn:
+            user = await conn.fetchrow(
+                "SELECT * FROM users WHERE phone_number = $1", form_data.phone
+            )
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={"errors": {"form": ["Invalid phone number or password"]}},
             )
 
-        if not verify_password(form_data.password, user["password_hash"]):
+        if not await verify_password(form_data.password, user["password_hash"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={"errors": {"form": ["Invalid phone number or password"]}},
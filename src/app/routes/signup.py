@@ -2,13 +2,13 @@ from datetime import date, datetime
 from typing import Optional
 
 from dateutil.relativedelta import relativedelta
-from passlib.context import CryptContext
 from pydantic import EmailStr, Field, field_validator
 
+from app.db.connection import acquire_db
 from app.routes.common_imports import *
+from app.utils.passwords import hash_password
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"])
 
 
 class SignupRequest(BaseModel):
@@ -36,35 +36,42 @@ class SignupRequest(BaseModel):
 
 @router.post("/signup")
 async def signup(user: SignupRequest):
-    hashed_password = pwd_context.hash(user.password)
     try:
-        conn = await get_db_connection()
         try:
-            existing_user = await conn.fetchrow(
-                "SELECT id FROM users WHERE phone_number = $1", user.phone
-            )
-            if existing_user:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail={
-                        "errors": {
-                            "phone": ["User with this phone number already exists"]
-                        }
-                    },
-                )
-
-            if user.email:
+            # Connections are only held for the queries, not while the
+            # password is hashed, so that a burst of sign-ups waiting on the
+            # hashing pool does not drain the database pool (as in signin)
+            async with acquire_db() as conn:
                 existing_user = await conn.fetchrow(
-                    "SELECT id FROM users WHERE email = $1", user.email
+                    "SELECT id FROM users WHERE phone_number = $1", user.phone
                 )
                 if existing_user:
                     raise HTTPException(
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail={
-                            "errors": {"email": ["User with this email already exists"]}
+                            "errors": {
+                                "phone": ["User with this phone number already exists"]
+                            }
                         },
                     )
 
+                if user.email:
+                    existing_user = await conn.fetchrow(
+                        "SELECT id FROM users WHERE email = $1", user.email
+                    )
+                    if existing_user:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail={
+                                "errors": {
+                                    "email": ["User with this email already exists"]
+                                }
+                            },
+                        )
+
+            # Hashed only once the user is known to be new
+            hashed_password = await hash_password(user.password)
+
             # Convert string date to datetime.date object
             birth_date = datetime.strptime(user.dateOfBirth, "%Y-%m-%d").date()
 
@@ -73,30 +80,33 @@ async def signup(user: SignupRequest):
             current_time = datetime.now()
             valid_until = current_time + relativedelta(years=5)
 
-            await conn.execute(
-                """
-                INSERT INTO users (id, email, password_hash, name, phone_number, date_of_birth) 
-                VALUES ($1, $2, $3, $4, $5, $6)
-                """,
-                user_id,
-                user.email,
-                hashed_password,
-                user.name,
-                user.phone,
-                birth_date,  # Pass the converted date object, not the string
-            )
-
-            await conn.execute(
-                """
-                INSERT INTO wallets(ticket_id, user_id, balance, valid_from, valid_until) 
-                VALUES ($1, $2, $3, $4, $5)
-                """,
-                wallet_id,
-                user_id,
-                300.0,
-                current_time,
-                valid_until,
-            )
+            async with acquire_db() as conn:
+                # Both rows or neither, so no user is left without a wallet
+                async with conn.transaction():
+                    await conn.execute(
+                        """
+                        INSERT INTO users (id, email, password_hash, name, phone_number, date_of_birth) 
+                        VALUES ($1, $2, $3, $4, $5, $6)
+                        """,
+                        user_id,
+                        user.email,
+                        hashed_password,
+                        user.name,
+                        user.phone,
+                        birth_date,  # Pass the converted date object, not the string
+                    )
+
+                    await conn.execute(
+                        """
+                        INSERT INTO wallets(ticket_id, user_id, balance, valid_from, valid_until) 
+                        VALUES ($1, $2, $3, $4, $5)
+                        """,
+                        wallet_id,
+                        user_id,
+                        300.0,
+                        current_time,
+                        valid_until,
+                    )
 
             return {
                 "message": "Sign up successful",
@@ -1,4 +1,6 @@
 from app.routes.common_imports import *
+from app.utils.graph import fare_pair
+from app.utils.graph_builder import refresh_graph_nodes
 
 router = APIRouter()
 
@@ -10,62 +12,35 @@ class FareUpdate(BaseModel):
 
 
 @router.post("/update_fare")
-async def update_fare(fare_update: FareUpdate):
+async def update_fare(fare_update: FareUpdate, conn: Connection = Depends(get_db)):
     try:
-        conn = await get_db_connection()
         station1_id = uuid.UUID(fare_update.origin_station_id)
         station2_id = uuid.UUID(fare_update.destination_station_id)
         price = int(fare_update.new_price)
         try:
-            row = await conn.fetchrow(
-                """
-                SELECT *
-                FROM ticket_price
-                WHERE (station1_id = $1 AND station2_id = $2) 
-                    OR (station1_id = $2 AND station2_id = $1)
-                """,
-                station1_id,
-                station2_id,
-            )
-
-            if row:
-                try:
-                    await conn.execute(
-                        """
-                        UPDATE ticket_price
-                        SET price = $3
-                        WHERE (station1_id = $1 AND station2_id = $2) 
-                            OR (station1_id = $2 AND station2_id = $1) 
-                        """,
-                        station1_id,
-                        station2_id,
-                        price,
-                    )
-                except Exception as e:
-                    logger.error(f"Error updating tickets: {str(e)}")
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Failed to update ticket_price. Please try again",
-                    )
-
-            else:
-                try:
-                    await conn.execute(
-                        """
-
-                        INSERT INTO ticket_price(station1_id, station2_id, price)
-                        VALUES ($1, $2, $3)
-                        """,
-                        station1_id,
-                        station2_id,
-                        price,
-                    )
-                except Exception as e:
-                    logger.error(f"Error inserting tickets: {str(e)}")
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Failed to update ticket_price. Please try again",
-                    )
+            # Fares are stored once per (least, greatest) station pair, so
+            # insert-or-update is a single probe of the unique pair index
+            try:
+                await conn.execute(
+                    """
+                    INSERT INTO ticket_price(station1_id, station2_id, price)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (station1_id, station2_id)
+                        DO UPDATE SET price = EXCLUDED.price
+                    """,
+                    *fare_pair(station1_id, station2_id),
+                    price,
+                )
+            except Exception as e:
+                logger.error(f"Error updating tickets: {str(e)}")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Failed to update ticket_price. Please try again",
+                )
+
+            metadata.set_fare(station1_id, station2_id, price)
+            # Keep the routing graph and the derived fare matrix in step
+            await refresh_graph_nodes(conn, [station1_id, station2_id])
         except Exception as e:
             logger.error(f"Error fetching tickets: {str(e)}")
             raise HTTPException(
@@ -10,10 +10,12 @@ class UpdateRouteRequest(BaseModel):
 
 
 @router.put("/update_route/{route_id}")
-async def update_route(route_update: UpdateRouteRequest, route_id: uuid.UUID):
+async def update_route(
+    route_update: UpdateRouteRequest,
+    route_id: uuid.UUID,
+    conn: Connection = Depends(get_db),
+):
     try:
-        conn = await get_db_connection()
-
         try:
             existing_row = await conn.fetchrow(
                 """
@@ -83,14 +85,14 @@ async def update_route(route_update: UpdateRouteRequest, route_id: uuid.UUID):
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail=f"Failed to update route: {route_update.route_name}",
                     )
+
+            await metadata.refresh_route(conn, route_id)
         except Exception as e:
             logger.error(f"Failed to update route: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to update route: {route_update.route_name}",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise HTTPException(
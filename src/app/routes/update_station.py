@@ -1,6 +1,7 @@
 from typing import Optional
 
 from app.routes.common_imports import *
+from app.utils.graph_builder import refresh_graph_nodes
 
 router = APIRouter()
 
@@ -15,10 +16,12 @@ class UpdateStationRequest(BaseModel):
 
 
 @router.put("/update_station/{station_id}")
-async def update_station(station_update: UpdateStationRequest, station_id: uuid.UUID):
+async def update_station(
+    station_update: UpdateStationRequest,
+    station_id: uuid.UUID,
+    conn: Connection = Depends(get_db),
+):
     try:
-        conn = await get_db_connection()
-
         try:
             existing_row = await conn.fetchrow(
                 """
@@ -105,11 +108,12 @@ async def update_station(station_update: UpdateStationRequest, station_id: uuid.
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail=f"Failed to create hub: {station_update.name}",
                     )
-            await conn.close()
+            await metadata.refresh_station(conn, station_id)
+            if station_update.is_hub:
+                await refresh_graph_nodes(conn, [station_id])
             return {"message": f"Successfully updated station: {station_update.name}"}
         except Exception as e:
             logger.error(f"Failed to update route: {str(e)}")
-            await conn.close()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to update route: {station_update.name}",
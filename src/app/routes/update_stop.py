@@ -1,4 +1,5 @@
 from app.routes.common_imports import *
+from app.utils.graph_builder import refresh_graph_nodes
 
 router = APIRouter()
 
@@ -10,10 +11,10 @@ class UpdateStopRequest(BaseModel):
 
 
 @router.put("/update_stop")
-async def update_route(stop_update: UpdateStopRequest):
+async def update_route(
+    stop_update: UpdateStopRequest, conn: Connection = Depends(get_db)
+):
     try:
-        conn = await get_db_connection()
-
         try:
             existing_row = await conn.fetchrow(
                 """
@@ -45,6 +46,10 @@ async def update_route(stop_update: UpdateStopRequest):
                         stop_update.route_id,
                         stop_update.stop_int,
                     )
+                    await metadata.refresh_route(conn, stop_update.route_id)
+                    await refresh_graph_nodes(
+                        conn, [existing_row["station_id"], stop_update.station_id]
+                    )
                     return {
                         "message": f"Successfully updated stop: {stop_update.stop_int}"
                     }
@@ -60,8 +65,6 @@ async def update_route(stop_update: UpdateStopRequest):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to update route: {stop_update.stop_int}",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise HTTPException(
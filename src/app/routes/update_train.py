@@ -11,10 +11,12 @@ class UpdateTrainRequest(BaseModel):
 
 
 @router.put("/update_train/{train_id}")
-async def update_train(train_update: UpdateTrainRequest, train_id: uuid.UUID):
+async def update_train(
+    train_update: UpdateTrainRequest,
+    train_id: uuid.UUID,
+    conn: Connection = Depends(get_db),
+):
     try:
-        conn = await get_db_connection()
-
         try:
             existing_row = await conn.fetchrow(
                 """
@@ -44,13 +46,11 @@ async def update_train(train_update: UpdateTrainRequest, train_id: uuid.UUID):
                 train_id,
             )
 
-            await conn.close()
             return {
                 "message": f"Successfully updated station: {train_update.train_code}"
             }
         except Exception as e:
             logger.error(f"Failed to update route: {str(e)}")
-            await conn.close()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to update route: {train_update.train_code}",
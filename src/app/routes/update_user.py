@@ -18,9 +18,10 @@ class UpdateUserRequest(BaseModel):
 
 
 @router.put("/users/{user_id}", response_model=UserDetailResponse)
-async def update_user(user_id: uuid.UUID, user_data: UpdateUserRequest):
+async def update_user(
+    user_id: uuid.UUID, user_data: UpdateUserRequest, conn: Connection = Depends(get_db)
+):
     try:
-        conn = await get_db_connection()
         try:
             # Check if user exists
             existing_user = await conn.fetchrow(
@@ -119,8 +120,6 @@ async def update_user(user_id: uuid.UUID, user_data: UpdateUserRequest):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to update user. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Error connecting to database: {str(e)}")
         raise HTTPException(
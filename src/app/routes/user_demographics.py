@@ -11,13 +11,12 @@ class DemographicData(BaseModel):
 
 
 @router.get("/user_demographics")
-async def get_user_demographics():
+async def get_user_demographics(conn: Connection = Depends(get_db)):
     """
     Get metrics for the dashboard including counts and statistics.
     This endpoint performs several database queries to calculate key metrics.
     """
     try:
-        conn = await get_db_connection()
         try:
             # Get total counts
             rows = await conn.fetch(
@@ -63,8 +62,6 @@ async def get_user_demographics():
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to fetch dashboard metrics. Please try again later.",
             )
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Error connecting to database: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+from app.utils.logger import logger
+
+load_dotenv()
+
+# JWT configuration. JWT_SECRET_KEY has no default: the app refuses to start
+# without it (see check_auth_config)
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+# Verified tokens whose claims are kept, and the longest they are kept for
+# even if the token expires later; 0 disables the cache
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+
+
+def _secret_key() -> str:
+    if not JWT_SECRET_KEY:
+        logger.error("JWT_SECRET_KEY is not set in the environment variables")
+        raise ValueError("JWT_SECRET_KEY is not set in the environment variables")
+    return JWT_SECRET_KEY
+
+
+def check_auth_config() -> None:
+    """
+    Fail at startup, rather than on the first sign-in or authenticated
+    request, if tokens cannot be signed or verified.
+
+    Raises:
+        ValueError: If JWT_SECRET_KEY is not set
+    """
+    _secret_key()
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.now(timezone.utc) + expires_delta
+    else:
+        expire = datetime.now(timezone.utc) + timedelta(
+            minutes=ACCESS_TOKEN_EXPIRE_MINUTES
+        )
+
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, _secret_key(), algorithm=JWT_ALGORITHM)
+    return encoded_jwt
+
+
+class _Entry(NamedTuple):
+    claims: Dict[str, Any]
+    expires_at: float
+
+
+class ClaimsCache:
+    """
+    A least-recently-used cache of the claims of verified tokens, keyed by
+    the SHA-256 of the token so that the tokens themselves are not kept in
+    memory. An entry is served until the token's exp claim or for at most
+    ttl seconds, whichever comes first.
+    """
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.claims
+
+    def put(self, key: bytes, claims: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+
+        self._entries[key] = _Entry(claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+claims_cache = ClaimsCache()
+
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a token's signature and expiry and return its claims, skipping the
+    verification for tokens verified recently.
+
+    Args:
+        token: The encoded JWT
+
+    Returns:
+        The token's claims. They are shared with the cache and must not be
+        modified.
+
+    Raises:
+        JWTError: If the token is malformed, forged or expired
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = claims_cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, _secret_key(), algorithms=[JWT_ALGORITHM])
+        claims_cache.put(key, claims)
+    return claims
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> Dict[str, Any]:
+    """
+    FastAPI dependency that authenticates the request's bearer token and
+    returns its claims (sub, user_id and role).
+    """
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    try:
+        return decode_access_token(credentials.credentials)
+    except JWTError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        ) from e
+
+
+async def require_admin(
+    claims: Dict[str, Any] = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """FastAPI dependency that only lets admins through."""
+    if claims.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return claims
@@ -0,0 +1,332 @@
+import asyncio
+import heapq
+import os
+import struct
+import time
+import uuid
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.graph import CompactGraph, snapshots
+from app.utils.logger import logger
+from app.utils.shared_memory import map_file, write_file_atomic
+
+# Precomputing all-pairs fares is opt-in; it costs O(V^2) memory
+FARE_MATRIX_ENABLED = os.getenv("FARE_MATRIX_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Above this many stations the matrix is not built and searches run on demand
+FARE_MATRIX_MAX_STATIONS = int(os.getenv("FARE_MATRIX_MAX_STATIONS", "2000"))
+# File the matrix is shared through between workers; empty disables sharing
+FARE_MATRIX_PATH = os.getenv("FARE_MATRIX_PATH", "fare_matrix.bin")
+
+
+class FareMatrix:
+    """
+    All-pairs cheapest fares and next-hop tables for a CompactGraph, stored
+    as flat row-major n x n arrays. fares[i * n + j] is the cheapest fare
+    from station i to station j, and next_hops[i * n + j] is the first
+    station after i on that cheapest path.
+    """
+
+    # Serialized layout: header, fares (float64), next hops (int64) in native
+    # byte order, then a CRC32 of everything before it
+    _MAGIC = b"MFARES"
+    _FORMAT_VERSION = 1
+    _HEADER = struct.Struct("=6sHQ32s")
+
+    def __init__(self, graph: CompactGraph):
+        """
+        Run one single-source Dijkstra per station to fill both tables.
+
+        Args:
+            graph: The compact graph the matrix is built for
+        """
+        self.graph = graph
+        self.size = graph.get_node_count()
+        self.fares = array("d")
+        self.next_hops = array("q")
+        for source in range(self.size):
+            fares, next_hops = self._single_source(source)
+            self.fares.extend(fares)
+            self.next_hops.extend(next_hops)
+
+    def _single_source(self, source: int) -> Tuple[array, array]:
+        infinity = float("infinity")
+        graph = self.graph
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+        fares = array("d", [infinity]) * self.size
+        next_hops = array("q", [-1]) * self.size
+        visited = bytearray(self.size)
+        fares[source] = 0.0
+        next_hops[source] = source
+
+        priority_queue = [(0.0, source, source)]
+        while priority_queue:
+            current_fare, current_node, first_hop = heapq.heappop(priority_queue)
+            if visited[current_node]:
+                continue
+            visited[current_node] = 1
+            next_hops[current_node] = first_hop
+
+            for k in range(offsets[current_node], offsets[current_node + 1]):
+                neighbor = targets[k]
+                if visited[neighbor]:
+                    continue
+                fare = current_fare + weights[k]
+                if fare < fares[neighbor]:
+                    fares[neighbor] = fare
+                    # Leaving the source, the first hop is the neighbor itself
+                    hop = neighbor if current_node == source else first_hop
+                    heapq.heappush(priority_queue, (fare, neighbor, hop))
+
+        return fares, next_hops
+
+    def to_bytes(self, checksum: str) -> bytes:
+        """
+        Serialize the matrix to a compact binary blob.
+
+        Args:
+            checksum: Fingerprint of the source data the graph was built from
+
+        Returns:
+            The serialized matrix
+        """
+        payload = b"".join(
+            [
+                self._HEADER.pack(
+                    self._MAGIC,
+                    self._FORMAT_VERSION,
+                    self.size,
+                    checksum.encode("ascii"),
+                ),
+                self.fares.tobytes(),
+                self.next_hops.tobytes(),
+            ]
+        )
+        return payload + struct.pack("=I", zlib.crc32(payload))
+
+    @classmethod
+    def from_bytes(cls, graph: CompactGraph, data: Any) -> Tuple["FareMatrix", str]:
+        """
+        Deserialize a matrix written by to_bytes. The tables are zero-copy
+        views into data, so a read-only mmap is shared between processes.
+
+        Args:
+            graph: The compact graph the matrix was built for
+            data: The serialized matrix (bytes, mmap or any other buffer)
+
+        Returns:
+            A tuple containing:
+            - matrix: The deserialized FareMatrix
+            - checksum: The source data fingerprint stored with it
+
+        Raises:
+            ValueError: If the data is truncated, corrupt, of another format
+                or sized for a different graph
+        """
+        if len(data) < cls._HEADER.size + 4:
+            raise ValueError("Fare matrix is truncated")
+        (crc,) = struct.unpack_from("=I", data, len(data) - 4)
+        if zlib.crc32(memoryview(data)[:-4]) != crc:
+            raise ValueError("Fare matrix checksum mismatch")
+
+        magic, version, size, checksum = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC or version != cls._FORMAT_VERSION:
+            raise ValueError("Unsupported fare matrix format")
+        if size != graph.get_node_count():
+            raise ValueError("Fare matrix does not match the graph")
+
+        view = memoryview(data)
+        cells = size * size
+        start = cls._HEADER.size
+        matrix = cls.__new__(cls)
+        matrix.graph = graph
+        matrix.size = size
+        matrix.fares = view[start : start + 8 * cells].cast("d")
+        matrix.next_hops = view[start + 8 * cells : start + 16 * cells].cast("q")
+        return matrix, checksum.decode("ascii")
+
+    def fare(self, start: uuid.UUID, end: uuid.UUID) -> float:
+        """
+        Get the cheapest fare between two stations in constant time.
+
+        Args:
+            start: UUID of the origin station
+            end: UUID of the destination station
+
+        Returns:
+            The cheapest fare, or infinity if end is unreachable
+        """
+        return self.fares[self.graph.index[start] * self.size + self.graph.index[end]]
+
+    def fares_from(self, start: uuid.UUID) -> Dict[uuid.UUID, float]:
+        """
+        Read one row of the matrix: the cheapest fare to every station.
+
+        Args:
+            start: UUID of the origin station
+
+        Returns:
+            Fare by station UUID, for the reachable stations only
+        """
+        offset = self.graph.index[start] * self.size
+        row = self.fares[offset : offset + self.size]
+        return {
+            node_id: fare
+            for node_id, fare in zip(self.graph.ids, row)
+            if fare != float("infinity")
+        }
+
+    def get_shortest_path(
+        self, start: uuid.UUID, end: uuid.UUID
+    ) -> Tuple[List[uuid.UUID], float]:
+        """
+        Reconstruct the cheapest path by following the next-hop table.
+        Same contract as calculate_fare.get_shortest_path.
+
+        Args:
+            start: UUID of the origin station
+            end: UUID of the destination station
+
+        Returns:
+            A tuple containing:
+            - path: List of node UUIDs from start to end, empty if unreachable
+            - total_distance: The cheapest fare
+        """
+        if start not in self.graph.index:
+            raise ValueError(f"Start node {start} not in graph")
+        if end not in self.graph.index:
+            raise ValueError(f"End node {end} not in graph")
+
+        current = self.graph.index[start]
+        target = self.graph.index[end]
+        total = self.fares[current * self.size + target]
+        if total == float("infinity"):
+            return [], total
+
+        path = [current]
+        while current != target:
+            current = self.next_hops[current * self.size + target]
+            path.append(current)
+        return [self.graph.ids[node] for node in path], total
+
+
+class FareMatrixCache:
+    """
+    Holds the most recent FareMatrix and rebuilds it in the background.
+    A matrix is only served for the snapshot graph it was built from, so a
+    stale matrix is never used after a new snapshot is published.
+    """
+
+    def __init__(self, enabled: bool = FARE_MATRIX_ENABLED):
+        self.enabled = enabled
+        self.matrix: Optional[FareMatrix] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+
+    def current(self, graph: CompactGraph) -> Optional[FareMatrix]:
+        """
+        Get the matrix if it is up to date with the given graph.
+
+        Args:
+            graph: The frozen graph queries are being answered against
+
+        Returns:
+            The matching FareMatrix, or None if there is none yet
+        """
+        matrix = self.matrix
+        if matrix is None or matrix.graph is not graph:
+            return None
+        return matrix
+
+    def schedule_rebuild(self) -> None:
+        """
+        Rebuild the matrix for the current graph snapshot in a worker thread.
+        Requests made while a rebuild is running are coalesced into one
+        follow-up rebuild.
+        """
+        if not self.enabled:
+            return
+        if self.is_rebuilding():
+            self._dirty = True
+            return
+        self._task = asyncio.create_task(self._rebuild())
+
+    async def load_shared(self, graph: CompactGraph, checksum: str) -> None:
+        """
+        Attach to the matrix file for this graph, or build and write it if it
+        is missing or stale. Called once at startup under the workers' shared
+        lock, so only the first worker builds and the rest memory-map it.
+
+        Args:
+            graph: The published graph the matrix must match
+            checksum: Fingerprint of the source tables the graph was built from
+        """
+        if not self.enabled:
+            return
+        if graph.get_node_count() > FARE_MATRIX_MAX_STATIONS:
+            logger.warning(
+                f"Skipping fare matrix: {graph.get_node_count()} stations exceeds {FARE_MATRIX_MAX_STATIONS}"
+            )
+            return
+
+        matrix = self._read_shared(graph, checksum)
+        if matrix is None:
+            started = time.perf_counter()
+            built = await asyncio.to_thread(FareMatrix, graph)
+            logger.info(
+                f"Fare matrix built for {graph.get_node_count()} stations in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            if FARE_MATRIX_PATH and write_file_atomic(
+                FARE_MATRIX_PATH, built.to_bytes(checksum)
+            ):
+                matrix = self._read_shared(graph, checksum)
+            matrix = matrix or built
+        self.matrix = matrix
+
+    def _read_shared(self, graph: CompactGraph, checksum: str) -> Optional[FareMatrix]:
+        data = map_file(FARE_MATRIX_PATH)
+        if data is None:
+            return None
+        try:
+            matrix, stored_checksum = FareMatrix.from_bytes(graph, data)
+        except ValueError as e:
+            logger.warning(f"Ignoring fare matrix {FARE_MATRIX_PATH}: {str(e)}")
+            return None
+        return matrix if stored_checksum == checksum else None
+
+    def is_rebuilding(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _rebuild(self) -> None:
+        while True:
+            self._dirty = False
+            # Snapshot graphs are immutable, so the thread can read it safely
+            compact = snapshots.current().graph
+            if compact.get_node_count() > FARE_MATRIX_MAX_STATIONS:
+                logger.warning(
+                    f"Skipping fare matrix: {compact.get_node_count()} stations exceeds {FARE_MATRIX_MAX_STATIONS}"
+                )
+                self.matrix = None
+                return
+
+            try:
+                started = time.perf_counter()
+                self.matrix = await asyncio.to_thread(FareMatrix, compact)
+                logger.info(
+                    f"Fare matrix built for {compact.get_node_count()} stations in {(time.perf_counter() - started) * 1000:.1f} ms"
+                )
+            except Exception as e:
+                logger.error(f"Error building fare matrix: {str(e)}")
+                return
+
+            if not self._dirty:
+                return
+
+
+fare_matrix = FareMatrixCache()
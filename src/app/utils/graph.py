@@ -1,6 +1,16 @@
+import os
+import struct
+import time
 import uuid
+import zlib
+from array import array
 from collections import defaultdict
-from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+# Seconds after which the metadata index is reloaded even without a local
+# mutation (other workers may have changed the data)
+METADATA_MAX_AGE = float(os.getenv("METADATA_MAX_AGE", "300"))
 
 
 class WeightedGraph:
@@ -15,6 +25,10 @@ class WeightedGraph:
         self.graph: Dict[uuid.UUID, List[Tuple[uuid.UUID, float]]] = defaultdict(list)
         # Set of all nodes (even those with no edges)
         self.nodes: Set[uuid.UUID] = set()
+        # Reverse adjacency: {node_uuid: {source_uuid with an edge to it, ...}}
+        self.reverse: Dict[uuid.UUID, Set[uuid.UUID]] = defaultdict(set)
+        # Cached compact copy, dropped on every mutation
+        self._frozen: Optional["CompactGraph"] = None
 
     def add_node(self, node_id: Optional[uuid.UUID] = None) -> uuid.UUID:
         """
@@ -30,6 +44,7 @@ class WeightedGraph:
             node_id = uuid.uuid4()
 
         self.nodes.add(node_id)
+        self._frozen = None
         return node_id
 
     def add_edge(
@@ -49,6 +64,8 @@ class WeightedGraph:
 
         # Add the edge
         self.graph[source].append((destination, weight))
+        self.reverse[destination].add(source)
+        self._frozen = None
 
     def add_bidirectional_edge(
         self, node1: uuid.UUID, node2: uuid.UUID, weight: float
@@ -76,16 +93,21 @@ class WeightedGraph:
 
         # Remove the node from the nodes set
         self.nodes.remove(node_id)
+        self._frozen = None
 
         # Remove all edges from this node
-        if node_id in self.graph:
-            del self.graph[node_id]
+        for dest, _ in self.graph.pop(node_id, []):
+            if dest != node_id:
+                self.reverse[dest].discard(node_id)
 
-        # Remove all edges to this node
-        for source in self.graph:
-            self.graph[source] = [
-                (dest, weight) for dest, weight in self.graph[source] if dest != node_id
-            ]
+        # Remove all edges to this node, visiting only the nodes that have one
+        for source in self.reverse.pop(node_id, set()):
+            if source in self.graph:
+                self.graph[source] = [
+                    (dest, weight)
+                    for dest, weight in self.graph[source]
+                    if dest != node_id
+                ]
 
     def remove_edge(self, source: uuid.UUID, destination: uuid.UUID) -> None:
         """
@@ -95,12 +117,14 @@ class WeightedGraph:
             source: UUID of the source node
             destination: UUID of the destination node
         """
+        self._frozen = None
         if source in self.graph:
             self.graph[source] = [
                 (dest, weight)
                 for dest, weight in self.graph[source]
                 if dest != destination
             ]
+            self.reverse[destination].discard(source)
 
     def get_neighbors(self, node_id: uuid.UUID) -> List[Tuple[uuid.UUID, float]]:
         """
@@ -114,6 +138,24 @@ class WeightedGraph:
         """
         return self.graph.get(node_id, [])
 
+    def get_edge_weight(
+        self, source: uuid.UUID, destination: uuid.UUID
+    ) -> Optional[float]:
+        """
+        Get the weight of the edge from source to destination.
+
+        Args:
+            source: UUID of the source node
+            destination: UUID of the destination node
+
+        Returns:
+            The weight of the cheapest such edge, or None if there is none
+        """
+        weights = [
+            weight for dest, weight in self.get_neighbors(source) if dest == destination
+        ]
+        return min(weights) if weights else None
+
     def get_all_edges(self) -> List[Tuple[uuid.UUID, uuid.UUID, float]]:
         """
         Get all edges in the graph.
@@ -145,6 +187,30 @@ class WeightedGraph:
         """
         return sum(len(neighbors) for neighbors in self.graph.values())
 
+    def replace_contents(self, other: "WeightedGraph") -> None:
+        """
+        Take over the nodes and edges of another graph in one step.
+
+        Args:
+            other: The graph whose contents replace this graph's
+        """
+        self.graph = other.graph
+        self.nodes = other.nodes
+        self.reverse = other.reverse
+        self._frozen = other._frozen
+
+    def freeze(self) -> "CompactGraph":
+        """
+        Get an immutable compact copy of the graph for fast traversal.
+        The copy is cached until the graph is next mutated.
+
+        Returns:
+            The CompactGraph equivalent of this graph
+        """
+        if self._frozen is None:
+            self._frozen = CompactGraph(self)
+        return self._frozen
+
     def __str__(self) -> str:
         """String representation of the graph."""
         result = "Graph:\n"
@@ -155,4 +221,595 @@ class WeightedGraph:
         return result
 
 
+class CompactGraph:
+    """
+    An immutable weighted graph stored in compressed sparse row (CSR) form.
+    Node UUIDs are interned to dense integer ids 0..n-1 and the outgoing edges
+    of node i are targets[offsets[i]:offsets[i + 1]] with matching weights.
+    """
+
+    def __init__(self, source: WeightedGraph):
+        """
+        Build the compact form of a WeightedGraph.
+
+        Args:
+            source: The graph to copy
+        """
+        # Dense id -> UUID, and back
+        self.ids: List[uuid.UUID] = sorted(source.nodes)
+        self.index: Dict[uuid.UUID, int] = {node: i for i, node in enumerate(self.ids)}
+
+        self.offsets = array("q", [0])
+        self.targets = array("q")
+        self.weights = array("d")
+        for node in self.ids:
+            for neighbor, weight in source.get_neighbors(node):
+                self.targets.append(self.index[neighbor])
+                self.weights.append(float(weight))
+            self.offsets.append(len(self.targets))
+
+    # Serialized layout: header, then node UUIDs (16 bytes each), offsets and
+    # targets (int64) and weights (float64) in native byte order, then a CRC32
+    # of everything before it
+    _MAGIC = b"MGRAPH"
+    _FORMAT_VERSION = 1
+    _HEADER = struct.Struct("=6sHQQ32s")
+
+    def to_bytes(self, checksum: str) -> bytes:
+        """
+        Serialize the graph to a compact binary blob.
+
+        Args:
+            checksum: Fingerprint of the source data, stored in the header
+
+        Returns:
+            The serialized graph
+        """
+        payload = b"".join(
+            [
+                self._HEADER.pack(
+                    self._MAGIC,
+                    self._FORMAT_VERSION,
+                    len(self.ids),
+                    len(self.targets),
+                    checksum.encode("ascii"),
+                ),
+                b"".join(node.bytes for node in self.ids),
+                self.offsets.tobytes(),
+                self.targets.tobytes(),
+                self.weights.tobytes(),
+            ]
+        )
+        return payload + struct.pack("=I", zlib.crc32(payload))
+
+    @classmethod
+    def from_bytes(cls, data: Any) -> Tuple["CompactGraph", str]:
+        """
+        Deserialize a graph written by to_bytes. Offsets, targets and weights
+        are zero-copy views into data, so when data is a read-only mmap the
+        pages are shared by every process that maps the same file.
+
+        Args:
+            data: The serialized graph (bytes, mmap or any other buffer)
+
+        Returns:
+            A tuple containing:
+            - graph: The deserialized CompactGraph
+            - checksum: The source data fingerprint stored with it
+
+        Raises:
+            ValueError: If the data is truncated, corrupt or of another format
+        """
+        if len(data) < cls._HEADER.size + 4:
+            raise ValueError("Graph snapshot is truncated")
+        (crc,) = struct.unpack_from("=I", data, len(data) - 4)
+        if zlib.crc32(memoryview(data)[:-4]) != crc:
+            raise ValueError("Graph snapshot checksum mismatch")
+
+        magic, version, node_count, edge_count, checksum = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC or version != cls._FORMAT_VERSION:
+            raise ValueError("Unsupported graph snapshot format")
+
+        view = memoryview(data)
+        position = cls._HEADER.size
+
+        def take(size: int) -> memoryview:
+            nonlocal position
+            chunk = view[position : position + size]
+            position += size
+            return chunk
+
+        graph = cls.__new__(cls)
+        ids_bytes = take(16 * node_count)
+        graph.ids = [
+            uuid.UUID(bytes=bytes(ids_bytes[i : i + 16]))
+            for i in range(0, len(ids_bytes), 16)
+        ]
+        graph.index = {node: i for i, node in enumerate(graph.ids)}
+        # The header and UUIDs keep the arrays 8-byte aligned
+        graph.offsets = take(8 * (node_count + 1)).cast("q")
+        graph.targets = take(8 * edge_count).cast("q")
+        graph.weights = take(8 * edge_count).cast("d")
+        return graph, checksum.decode("ascii")
+
+    def thaw(self) -> WeightedGraph:
+        """
+        Build a mutable WeightedGraph with the same nodes and edges.
+
+        Returns:
+            The equivalent WeightedGraph, with this graph as its frozen copy
+        """
+        graph = WeightedGraph()
+        for node in self.ids:
+            graph.add_node(node)
+        for node, node_id in enumerate(self.ids):
+            for k in self.edge_range(node):
+                graph.add_edge(node_id, self.ids[self.targets[k]], self.weights[k])
+        graph._frozen = self
+        return graph
+
+    @property
+    def nodes(self) -> Dict[uuid.UUID, int]:
+        """The node UUIDs, usable for membership tests like WeightedGraph.nodes."""
+        return self.index
+
+    def edge_range(self, node: int) -> range:
+        """
+        Get the positions of a node's outgoing edges in targets/weights.
+
+        Args:
+            node: Dense id of the node
+
+        Returns:
+            Range of indices into targets and weights
+        """
+        return range(self.offsets[node], self.offsets[node + 1])
+
+    def get_neighbors(self, node_id: uuid.UUID) -> List[Tuple[uuid.UUID, float]]:
+        """
+        Get all neighbors of a node along with the edge weights.
+
+        Args:
+            node_id: UUID of the node
+
+        Returns:
+            List of tuples containing (neighbor_uuid, weight)
+        """
+        node = self.index.get(node_id)
+        if node is None:
+            return []
+        return [
+            (self.ids[self.targets[k]], self.weights[k]) for k in self.edge_range(node)
+        ]
+
+    def get_edge_weight(
+        self, source: uuid.UUID, destination: uuid.UUID
+    ) -> Optional[float]:
+        """
+        Get the weight of the edge from source to destination.
+
+        Args:
+            source: UUID of the source node
+            destination: UUID of the destination node
+
+        Returns:
+            The weight of the cheapest such edge, or None if there is none
+        """
+        node = self.index.get(source)
+        target = self.index.get(destination)
+        if node is None or target is None:
+            return None
+        weights = [
+            self.weights[k] for k in self.edge_range(node) if self.targets[k] == target
+        ]
+        return min(weights) if weights else None
+
+    def get_node_count(self) -> int:
+        return len(self.ids)
+
+    def get_edge_count(self) -> int:
+        return len(self.targets)
+
+    # Transposed copy, built on first use
+    _transposed: Optional["CompactGraph"] = None
+
+    def transpose(self) -> "CompactGraph":
+        """
+        Get the graph with every edge reversed, sharing this graph's node ids.
+        Backward searches walk its outgoing edges to follow incoming ones.
+
+        Returns:
+            The transposed graph
+        """
+        if self._transposed is not None:
+            return self._transposed
+
+        node_count = self.get_node_count()
+        offsets = array("q", [0]) * (node_count + 1)
+        for target in self.targets:
+            offsets[target + 1] += 1
+        for node in range(node_count):
+            offsets[node + 1] += offsets[node]
+
+        targets = array("q", [0]) * len(self.targets)
+        weights = array("d", [0.0]) * len(self.targets)
+        position = array("q", offsets[:-1])
+        for node in range(node_count):
+            for k in self.edge_range(node):
+                slot = position[self.targets[k]]
+                targets[slot] = node
+                weights[slot] = self.weights[k]
+                position[self.targets[k]] += 1
+
+        transposed = CompactGraph.__new__(CompactGraph)
+        transposed.ids = self.ids
+        transposed.index = self.index
+        transposed.offsets = offsets
+        transposed.targets = targets
+        transposed.weights = weights
+        transposed._transposed = self
+        self._transposed = transposed
+        return transposed
+
+
+def fare_pair(
+    station1_id: uuid.UUID, station2_id: uuid.UUID
+) -> Tuple[uuid.UUID, uuid.UUID]:
+    """
+    Order a station pair the way ticket_price stores it: (least, greatest).
+    UUIDs compare by value in Python exactly as PostgreSQL orders them.
+
+    Args:
+        station1_id: UUID of one station
+        station2_id: UUID of the other station
+
+    Returns:
+        The canonical (station1_id, station2_id) pair
+    """
+    if station2_id < station1_id:
+        return station2_id, station1_id
+    return station1_id, station2_id
+
+
+class StationInfo(NamedTuple):
+    station_id: uuid.UUID
+    name: str
+    location: str
+    status: str
+
+
+class RouteStop(NamedTuple):
+    station_id: uuid.UUID
+    stop_int: int
+    ticket_price: Optional[int]
+
+
+class RouteInfo(NamedTuple):
+    route_id: uuid.UUID
+    name: str
+    start_station_id: uuid.UUID
+    end_station_id: uuid.UUID
+    # Ordered by stop_int
+    stops: Tuple[RouteStop, ...]
+
+
+class MetadataIndex:
+    """
+    Process-local index of station, route and fare metadata so that hot
+    lookups (names, locations, ordered stops, direct fares) do not need a
+    database round trip.
+    Mutating endpoints refresh the affected entries after they commit.
+    """
+
+    def __init__(self, max_age: float = METADATA_MAX_AGE):
+        """
+        Initialize an empty index.
+
+        Args:
+            max_age: Seconds after which ensure_fresh reloads the whole index
+        """
+        self.max_age = max_age
+        self.stations: Dict[uuid.UUID, StationInfo] = {}
+        self.routes: Dict[uuid.UUID, RouteInfo] = {}
+        # Reverse index: station_id -> ids of routes that stop there
+        self.station_routes: Dict[uuid.UUID, Set[uuid.UUID]] = defaultdict(set)
+        # Mirror of ticket_price, keyed by canonical fare_pair
+        self.fares: Dict[Tuple[uuid.UUID, uuid.UUID], float] = {}
+        # Reverse index: station_id -> direct fare to every other station
+        self.station_fares: Dict[uuid.UUID, Dict[uuid.UUID, float]] = defaultdict(dict)
+        self.loaded_at: Optional[float] = None
+        # Bumped on every change, so caches of derived data can key on it
+        self.version = 0
+
+    async def load(self, conn: Any) -> None:
+        """
+        (Re)load every station, route and fare from the database.
+
+        Args:
+            conn: Database connection
+        """
+        station_rows = await conn.fetch(
+            """
+            SELECT station_id, station_name, location, status FROM stations
+            """
+        )
+        route_rows = await conn.fetch(
+            """
+            SELECT route_id, route_name, start_station_id, end_station_id FROM routes
+            """
+        )
+        stop_rows = await conn.fetch(
+            """
+            SELECT route_id, station_id, stop_int, ticket_price
+            FROM routes_stations
+            ORDER BY route_id, stop_int
+            """
+        )
+        fare_rows = await conn.fetch(
+            """
+            SELECT station1_id, station2_id, price FROM ticket_price
+            """
+        )
+
+        stops: Dict[uuid.UUID, List[RouteStop]] = defaultdict(list)
+        for row in stop_rows:
+            stops[row["route_id"]].append(
+                RouteStop(row["station_id"], row["stop_int"], row["ticket_price"])
+            )
+
+        stations = {
+            row["station_id"]: self._station_from_row(row) for row in station_rows
+        }
+        routes = {
+            row["route_id"]: self._route_from_row(row, stops.get(row["route_id"], []))
+            for row in route_rows
+        }
+        station_routes: Dict[uuid.UUID, Set[uuid.UUID]] = defaultdict(set)
+        for route in routes.values():
+            for stop in route.stops:
+                station_routes[stop.station_id].add(route.route_id)
+
+        fares = {
+            fare_pair(row["station1_id"], row["station2_id"]): row["price"]
+            for row in fare_rows
+        }
+        station_fares: Dict[uuid.UUID, Dict[uuid.UUID, float]] = defaultdict(dict)
+        for (station1_id, station2_id), price in fares.items():
+            station_fares[station1_id][station2_id] = price
+            station_fares[station2_id][station1_id] = price
+
+        # Swap in the new maps in one go so readers never see a partial index
+        (
+            self.stations,
+            self.routes,
+            self.station_routes,
+            self.fares,
+            self.station_fares,
+        ) = (stations, routes, station_routes, fares, station_fares)
+        self.loaded_at = time.monotonic()
+        self.version += 1
+
+    async def ensure_fresh(self, conn: Any) -> None:
+        """
+        Load the index if it was never loaded or is older than max_age.
+
+        Args:
+            conn: Database connection
+        """
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age:
+            await self.load(conn)
+
+    async def refresh_station(self, conn: Any, station_id: uuid.UUID) -> None:
+        """
+        Reload a single station, dropping it if it no longer exists.
+
+        Args:
+            conn: Database connection
+            station_id: UUID of the station to refresh
+        """
+        row = await conn.fetchrow(
+            """
+            SELECT station_id, station_name, location, status FROM stations
+            WHERE station_id = $1
+            """,
+            station_id,
+        )
+        if row:
+            self.stations[station_id] = self._station_from_row(row)
+        else:
+            self.stations.pop(station_id, None)
+        self.version += 1
+
+    async def refresh_route(self, conn: Any, route_id: uuid.UUID) -> None:
+        """
+        Reload a single route and its stops, dropping it if it no longer exists.
+
+        Args:
+            conn: Database connection
+            route_id: UUID of the route to refresh
+        """
+        row = await conn.fetchrow(
+            """
+            SELECT route_id, route_name, start_station_id, end_station_id FROM routes
+            WHERE route_id = $1
+            """,
+            route_id,
+        )
+        stop_rows = await conn.fetch(
+            """
+            SELECT station_id, stop_int, ticket_price
+            FROM routes_stations
+            WHERE route_id = $1
+            ORDER BY stop_int
+            """,
+            route_id,
+        )
+
+        old_route = self.routes.pop(route_id, None)
+        if old_route:
+            for stop in old_route.stops:
+                self.station_routes[stop.station_id].discard(route_id)
+
+        if row:
+            stops = [
+                RouteStop(stop["station_id"], stop["stop_int"], stop["ticket_price"])
+                for stop in stop_rows
+            ]
+            route = self._route_from_row(row, stops)
+            self.routes[route_id] = route
+            for stop in route.stops:
+                self.station_routes[stop.station_id].add(route_id)
+        self.version += 1
+
+    def set_fare(
+        self, station1_id: uuid.UUID, station2_id: uuid.UUID, price: float
+    ) -> None:
+        """
+        Record a committed fare change.
+
+        Args:
+            station1_id: UUID of one station
+            station2_id: UUID of the other station
+            price: The new ticket price
+        """
+        self.fares[fare_pair(station1_id, station2_id)] = price
+        self.station_fares[station1_id][station2_id] = price
+        self.station_fares[station2_id][station1_id] = price
+        self.version += 1
+
+    def get_fare(
+        self, station1_id: uuid.UUID, station2_id: uuid.UUID
+    ) -> Optional[float]:
+        """
+        Get the direct ticket price between two stations, in either direction.
+
+        Args:
+            station1_id: UUID of one station
+            station2_id: UUID of the other station
+
+        Returns:
+            The price, or None if the stations share no ticket_price entry
+        """
+        return self.fares.get(fare_pair(station1_id, station2_id))
+
+    def get_fares_from(self, station_id: uuid.UUID) -> Dict[uuid.UUID, float]:
+        """
+        Get the direct ticket price from a station to every station it has a
+        ticket_price entry with.
+
+        Args:
+            station_id: UUID of the station
+
+        Returns:
+            Price by other station UUID; do not modify it
+        """
+        return self.station_fares.get(station_id, {})
+
+    def get_station(self, station_id: uuid.UUID) -> Optional[StationInfo]:
+        return self.stations.get(station_id)
+
+    def get_route(self, route_id: uuid.UUID) -> Optional[RouteInfo]:
+        return self.routes.get(route_id)
+
+    def find_shared_route(
+        self, station1_id: uuid.UUID, station2_id: uuid.UUID
+    ) -> Optional[RouteInfo]:
+        """
+        Find a route that stops at both stations.
+
+        Args:
+            station1_id: UUID of the first station
+            station2_id: UUID of the second station
+
+        Returns:
+            The shared route, or None if the stations are on no common route
+        """
+        shared = self.station_routes.get(station1_id, set()) & self.station_routes.get(
+            station2_id, set()
+        )
+        if not shared:
+            return None
+        return self.routes[min(shared)]
+
+    @staticmethod
+    def _station_from_row(row: Any) -> StationInfo:
+        return StationInfo(
+            station_id=row["station_id"],
+            name=row["station_name"],
+            location=row["location"],
+            status=row["status"],
+        )
+
+    @staticmethod
+    def _route_from_row(row: Any, stops: List[RouteStop]) -> RouteInfo:
+        return RouteInfo(
+            route_id=row["route_id"],
+            name=row["route_name"],
+            start_station_id=row["start_station_id"],
+            end_station_id=row["end_station_id"],
+            stops=tuple(stops),
+        )
+
+
+class GraphSnapshot:
+    """
+    An immutable, versioned view of the routing graph. A request takes the
+    current snapshot once and runs every search against it, so concurrent
+    rebuilds can never hand it a half-updated graph.
+    """
+
+    def __init__(self, version: int, graph: CompactGraph):
+        """
+        Initialize a snapshot.
+
+        Args:
+            version: Monotonically increasing version id
+            graph: The frozen graph this snapshot serves
+        """
+        self.version = version
+        self.graph = graph
+        self.created_at = datetime.now(timezone.utc)
+
+
+class GraphSnapshotStore:
+    """
+    Holds the published GraphSnapshot. Publishing is a single reference
+    assignment, so readers see either the old or the new snapshot.
+    """
+
+    def __init__(self):
+        self._current = GraphSnapshot(0, CompactGraph(WeightedGraph()))
+
+    def current(self) -> GraphSnapshot:
+        return self._current
+
+    def publish(self, source: WeightedGraph) -> GraphSnapshot:
+        """
+        Freeze a graph and make it the current snapshot.
+
+        Args:
+            source: The graph to publish
+
+        Returns:
+            The newly published snapshot
+        """
+        return self.publish_frozen(source.freeze())
+
+    def publish_frozen(self, compact: CompactGraph) -> GraphSnapshot:
+        """
+        Make an already frozen graph the current snapshot.
+
+        Args:
+            compact: The graph to publish
+
+        Returns:
+            The newly published snapshot
+        """
+        snapshot = GraphSnapshot(self._current.version + 1, compact)
+        self._current = snapshot
+        return snapshot
+
+
 graph = WeightedGraph()
+metadata = MetadataIndex()
+snapshots = GraphSnapshotStore()
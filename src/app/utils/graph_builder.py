@@ -0,0 +1,403 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+from app.db.connection import get_db_pool
+from app.utils.fare_matrix import fare_matrix
+from app.utils.graph import (
+    CompactGraph,
+    GraphSnapshot,
+    WeightedGraph,
+    graph,
+    metadata,
+    snapshots,
+)
+from app.utils.logger import logger
+from app.utils.shared_memory import leader_lock, map_file, write_file_atomic
+
+# File the built graph is persisted to so that workers can skip the database
+# at startup; set to an empty string to disable
+GRAPH_SNAPSHOT_PATH = os.getenv("GRAPH_SNAPSHOT_PATH", "graph_snapshot.bin")
+# Seconds between checks that the graph still matches the database, which
+# pick up mutations committed through other workers; 0 disables them
+GRAPH_FRESHNESS_INTERVAL = float(os.getenv("GRAPH_FRESHNESS_INTERVAL", "30"))
+
+# Whether the live WeightedGraph holds the published graph; workers that
+# attached to a shared snapshot only build it on their first mutation
+_materialized = True
+# SOURCE_CHECKSUM_QUERY as of the data the published graph was built from
+_source_checksum: Optional[str] = None
+
+# Attempts a full rebuild makes before giving up when concurrent mutations
+# keep publishing newer snapshots underneath it
+MAX_REBUILD_ATTEMPTS = 3
+
+# Every (hub, station on one of the hub's routes) pair together with its
+# ticket price. $1 optionally restricts the result to the connections that
+# touch any of the given stations, either as the hub or as the station.
+HUB_CONNECTIONS_QUERY = """
+    SELECT DISTINCT ON (h.station_id, rs.station_id)
+        h.station_id AS hub_id, rs.station_id AS station_id, tp.price AS price
+    FROM hubs h
+        JOIN routes_stations rs
+            ON rs.route_id = h.route1_id OR rs.route_id = h.route2_id
+        LEFT JOIN ticket_price tp
+            ON tp.station1_id = least(h.station_id, rs.station_id)
+            AND tp.station2_id = greatest(h.station_id, rs.station_id)
+    WHERE rs.station_id <> h.station_id
+        AND ($1::uuid[] IS NULL OR h.station_id = ANY($1) OR rs.station_id = ANY($1))
+"""
+
+# Fingerprint of every row the graph is derived from. A persisted snapshot is
+# only reused while this still matches the checksum it was written with.
+SOURCE_CHECKSUM_QUERY = """
+    SELECT md5(
+        coalesce((
+            SELECT string_agg(
+                station_id::text || ':' || route1_id::text || ':' || coalesce(route2_id::text, ''),
+                ',' ORDER BY station_id, route1_id, route2_id
+            )
+            FROM hubs
+        ), '')
+        || '|' ||
+        coalesce((
+            SELECT string_agg(
+                route_id::text || ':' || station_id::text,
+                ',' ORDER BY route_id, station_id
+            )
+            FROM routes_stations
+        ), '')
+        || '|' ||
+        coalesce((
+            SELECT string_agg(
+                station1_id::text || ':' || station2_id::text || ':' || price::text,
+                ',' ORDER BY station1_id, station2_id, price
+            )
+            FROM ticket_price
+        ), '')
+    )
+"""
+
+
+def add_connections(graph: WeightedGraph, rows: List[Any]) -> int:
+    """
+    Add hub connection rows to a graph as bidirectional edges.
+
+    Args:
+        graph: The graph to add to
+        rows: Rows of HUB_CONNECTIONS_QUERY
+
+    Returns:
+        Number of connections skipped because they have no ticket price
+    """
+    seen: Set[Tuple[uuid.UUID, uuid.UUID]] = set()
+    missing_prices = 0
+    for row in rows:
+        # Convert asyncpg UUID to Python's standard UUID
+        hub_id = uuid.UUID(str(row["hub_id"]))
+        station_id = uuid.UUID(str(row["station_id"]))
+        graph.add_node(hub_id)
+        graph.add_node(station_id)
+
+        if row["price"] is None:
+            missing_prices += 1
+            logger.debug(
+                "No price found between stations %s and %s", hub_id, station_id
+            )
+            continue
+
+        # Two hubs on the same route see each other twice; keep one edge pair
+        pair = (hub_id, station_id) if hub_id < station_id else (station_id, hub_id)
+        if pair in seen:
+            continue
+        seen.add(pair)
+        graph.add_bidirectional_edge(hub_id, station_id, row["price"])
+
+    return missing_prices
+
+
+async def build_graph(graph: WeightedGraph) -> WeightedGraph:
+    try:
+        started = time.perf_counter()
+        async with get_db_pool().acquire() as conn:
+            rows = await conn.fetch(HUB_CONNECTIONS_QUERY, None)
+        fetched = time.perf_counter()
+
+        missing_prices = add_connections(graph, rows)
+        finished = time.perf_counter()
+
+        if missing_prices:
+            logger.warning(f"No price found for {missing_prices} hub connections")
+        logger.info(
+            f"Graph built successfully with {graph.get_node_count()} nodes and {graph.get_edge_count()} edges "
+            f"in {(finished - started) * 1000:.1f} ms "
+            f"(query {(fetched - started) * 1000:.1f} ms, assembly {(finished - fetched) * 1000:.1f} ms)"
+        )
+        logger.debug("%s", graph)
+
+        return graph
+
+    except Exception as e:
+        logger.error(f"Error building graph: {str(e)}")
+        # Re-raise or return None depending on how you want to handle failures
+        raise
+
+
+def read_graph_snapshot(path: str, checksum: str) -> Optional[CompactGraph]:
+    """
+    Attach to a persisted graph if it exists and matches the source data.
+    The file is memory-mapped, so its arrays are shared by all workers.
+
+    Args:
+        path: Snapshot file path
+        checksum: Current fingerprint of the source tables
+
+    Returns:
+        The persisted graph, or None if it is missing, unreadable or stale
+    """
+    data = map_file(path)
+    if data is None:
+        return None
+
+    try:
+        compact, stored_checksum = CompactGraph.from_bytes(data)
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable graph snapshot {path}: {str(e)}")
+        return None
+
+    if stored_checksum != checksum:
+        logger.info(f"Graph snapshot {path} is stale")
+        return None
+    return compact
+
+
+def write_graph_snapshot(path: str, compact: CompactGraph, checksum: str) -> None:
+    """
+    Persist a graph, replacing the file atomically so that concurrently
+    starting workers never read a partial snapshot.
+
+    Args:
+        path: Snapshot file path
+        compact: The graph to persist
+        checksum: Fingerprint of the source tables the graph was built from
+    """
+    if path and write_file_atomic(path, compact.to_bytes(checksum)):
+        logger.info(f"Graph snapshot written to {path}")
+
+
+async def load_graph(graph: WeightedGraph) -> GraphSnapshot:
+    """
+    Load the routing graph and publish it as the first snapshot.
+
+    Workers take a host-wide lock in turn. The first one finds the snapshot
+    file missing or stale, builds the graph (and the fare matrix, if enabled)
+    from the database and writes them out; every worker then memory-maps the
+    files, so the frozen graph and fare tables exist once per host rather
+    than once per worker. The mutable graph is only materialized in a worker
+    when it first applies an incremental update.
+
+    The checksum is taken before building, so a file can only ever be
+    labelled with older data than it holds, which just forces a rebuild.
+
+    Args:
+        graph: The live graph; filled directly if snapshots cannot be shared
+
+    Returns:
+        The published snapshot
+    """
+    global _materialized, _source_checksum
+    lock_path = f"{GRAPH_SNAPSHOT_PATH}.lock" if GRAPH_SNAPSHOT_PATH else ""
+    async with leader_lock(lock_path):
+        started = time.perf_counter()
+        async with get_db_pool().acquire() as conn:
+            checksum = await conn.fetchval(SOURCE_CHECKSUM_QUERY)
+
+        compact = read_graph_snapshot(GRAPH_SNAPSHOT_PATH, checksum)
+        if compact is None:
+            await build_graph(graph)
+            _materialized = True
+            write_graph_snapshot(GRAPH_SNAPSHOT_PATH, graph.freeze(), checksum)
+            # Attach to the file just written so this worker shares it too
+            compact = read_graph_snapshot(GRAPH_SNAPSHOT_PATH, checksum)
+        else:
+            _materialized = False
+            logger.info(
+                f"Graph attached from {GRAPH_SNAPSHOT_PATH} with {compact.get_node_count()} nodes and {compact.get_edge_count()} edges "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+
+        snapshot = (
+            snapshots.publish_frozen(compact)
+            if compact is not None
+            else snapshots.publish(graph)
+        )
+        _source_checksum = checksum
+        await fare_matrix.load_shared(snapshot.graph, checksum)
+        return snapshot
+
+
+def ensure_materialized() -> None:
+    """
+    Make sure the live graph holds the published nodes and edges before an
+    incremental update is applied to it.
+    """
+    global _materialized
+    if not _materialized:
+        graph.replace_contents(snapshots.current().graph.thaw())
+        _materialized = True
+
+
+async def refresh_graph_nodes(conn: Any, station_ids: Iterable[uuid.UUID]) -> None:
+    """
+    Bring the live graph in line with the database for the given stations
+    after a committed mutation, without rebuilding the whole graph.
+    Every edge touching one of the stations is dropped and re-derived from
+    the current hubs, routes_stations and ticket_price rows, and the result
+    is written to the snapshot file for the other workers to attach to.
+    Failures are logged rather than raised, since the database change
+    already committed.
+
+    Args:
+        conn: Database connection
+        station_ids: UUIDs of the stations whose connections may have changed
+    """
+    global _source_checksum
+    station_ids = list(set(station_ids))
+    if not station_ids:
+        return
+
+    try:
+        # Taken before the rows, like in load_graph
+        checksum = await conn.fetchval(SOURCE_CHECKSUM_QUERY)
+        rows = await conn.fetch(HUB_CONNECTIONS_QUERY, station_ids)
+
+        # No awaits from here on, so requests never see a half-updated graph
+        ensure_materialized()
+        for station_id in station_ids:
+            graph.remove_node(station_id)
+        add_connections(graph, rows)
+        snapshot = snapshots.publish(graph)
+        _source_checksum = checksum
+        fare_matrix.schedule_rebuild()
+
+        logger.info(
+            f"Graph refreshed for {len(station_ids)} stations: {graph.get_node_count()} nodes, {graph.get_edge_count()} edges"
+        )
+        await asyncio.to_thread(
+            write_graph_snapshot, GRAPH_SNAPSHOT_PATH, snapshot.graph, checksum
+        )
+    except Exception as e:
+        logger.error(f"Error refreshing graph: {str(e)}")
+
+
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+def is_rebuilding() -> bool:
+    return _rebuild_task is not None and not _rebuild_task.done()
+
+
+def schedule_graph_rebuild() -> bool:
+    """
+    Start a full graph rebuild in the background unless one is running.
+
+    Returns:
+        True if a new rebuild was started
+    """
+    global _rebuild_task
+    if is_rebuilding():
+        return False
+    _rebuild_task = asyncio.create_task(rebuild_graph())
+    return True
+
+
+async def rebuild_graph() -> None:
+    """
+    Rebuild the routing graph from the database off to the side, then swap
+    it in and publish it as a new snapshot. In-flight queries keep using the
+    snapshot they started with. If an incremental refresh publishes while
+    the rebuild is loading, the rebuilt graph may predate it, so the rebuild
+    starts over instead of overwriting the newer state.
+    """
+    global _materialized, _source_checksum
+    for _ in range(MAX_REBUILD_ATTEMPTS):
+        base_version = snapshots.current().version
+        try:
+            async with get_db_pool().acquire() as conn:
+                checksum = await conn.fetchval(SOURCE_CHECKSUM_QUERY)
+            new_graph = await build_graph(WeightedGraph())
+        except Exception as e:
+            logger.error(f"Error rebuilding graph: {str(e)}")
+            return
+
+        # No awaits from here on: check, swap and publish happen atomically
+        if snapshots.current().version != base_version:
+            logger.info("Graph changed during rebuild, starting over")
+            continue
+        graph.replace_contents(new_graph)
+        _materialized = True
+        snapshot = snapshots.publish(graph)
+        _source_checksum = checksum
+        fare_matrix.schedule_rebuild()
+        logger.info(f"Published rebuilt graph as version {snapshot.version}")
+        await asyncio.to_thread(
+            write_graph_snapshot, GRAPH_SNAPSHOT_PATH, snapshot.graph, checksum
+        )
+        return
+
+    logger.warning(f"Graph rebuild abandoned after {MAX_REBUILD_ATTEMPTS} attempts")
+
+
+async def check_graph_freshness() -> None:
+    """
+    Bring this worker in line with mutations committed through other
+    workers, which only refresh their own graph. If the source tables no
+    longer match the published graph, the metadata index is reloaded and
+    the graph is attached from the snapshot file when that file matches
+    the database, or rebuilt otherwise. Publishing a new snapshot also
+    retires the journeys cached against the old one.
+    """
+    global _materialized, _source_checksum
+    if is_rebuilding():
+        return
+
+    base_version = snapshots.current().version
+    async with get_db_pool().acquire() as conn:
+        checksum = await conn.fetchval(SOURCE_CHECKSUM_QUERY)
+        if checksum == _source_checksum:
+            return
+        await metadata.load(conn)
+
+    compact = read_graph_snapshot(GRAPH_SNAPSHOT_PATH, checksum)
+    if compact is None:
+        logger.info("Graph is out of date with the database, rebuilding")
+        schedule_graph_rebuild()
+        return
+
+    # A refresh in this worker published meanwhile; check again next time
+    if snapshots.current().version != base_version:
+        return
+    snapshot = snapshots.publish_frozen(compact)
+    _materialized = False
+    _source_checksum = checksum
+    fare_matrix.schedule_rebuild()
+    logger.info(
+        f"Graph attached from {GRAPH_SNAPSHOT_PATH} as version {snapshot.version}"
+    )
+
+
+async def watch_graph_freshness(interval: float = GRAPH_FRESHNESS_INTERVAL) -> None:
+    """
+    Run check_graph_freshness every interval seconds until cancelled.
+
+    Args:
+        interval: Seconds between checks
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await check_graph_freshness()
+        except Exception as e:
+            logger.error(f"Error checking graph freshness: {str(e)}")
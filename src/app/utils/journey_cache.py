@@ -0,0 +1,121 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+from app.utils.logger import logger
+
+# Total estimated size of the cached responses; 0 disables the cache
+JOURNEY_CACHE_MAX_BYTES = int(
+    os.getenv("JOURNEY_CACHE_MAX_BYTES", str(8 * 1024 * 1024))
+)
+# Seconds a cached journey is served before it is computed again
+JOURNEY_CACHE_TTL = float(os.getenv("JOURNEY_CACHE_TTL", "300"))
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+
+
+class JourneyCache:
+    """
+    A least-recently-used cache of built journey responses, bounded by total
+    size and entry age. Every lookup and store names the version of the data
+    it answers against (for journeys, the graph snapshot and metadata index
+    versions). The first one to name a newer version drops every entry, so a
+    fare, stop or hub mutation invalidates the cache without any explicit
+    call, and values computed against a replaced version are never stored.
+    """
+
+    def __init__(
+        self, max_bytes: int = JOURNEY_CACHE_MAX_BYTES, ttl: float = JOURNEY_CACHE_TTL
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            key: The cache key
+            version: Version of the data the caller is answering against
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        self._check_version(version)
+
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: Hashable, version: Hashable, value: Any, size: int) -> None:
+        """
+        Store a value, evicting the least recently used entries to make room.
+
+        Args:
+            key: The cache key
+            version: Version of the data the value was computed against
+            value: The value to cache
+            size: Estimated size of the value in bytes
+        """
+        if not self.enabled or size > self.max_bytes:
+            return
+        self._check_version(version)
+        if self._version != version:
+            # Computed against a snapshot that has since been replaced
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, size, time.monotonic() + self.ttl)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: Hashable) -> None:
+        if self._version is None or version > self._version:
+            if self._entries:
+                logger.debug(
+                    f"Journey cache dropped {len(self._entries)} entries for version {version}"
+                )
+            self.clear()
+            self._version = version
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+
+journey_cache = JourneyCache()
@@ -0,0 +1,180 @@
+import os
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.utils.graph import CompactGraph, MetadataIndex
+
+# Most line changes a planned journey may make
+PLANNER_MAX_TRANSFERS = int(os.getenv("PLANNER_MAX_TRANSFERS", "3"))
+
+
+class JourneyLeg(NamedTuple):
+    start_id: uuid.UUID
+    end_id: uuid.UUID
+    route_id: uuid.UUID
+    price: float
+    stops: int
+
+
+class Journey(NamedTuple):
+    legs: Tuple[JourneyLeg, ...]
+    fare: float
+    transfers: int
+    stops: int
+
+    def dominates(self, other: "Journey") -> bool:
+        """True if this journey is at least as good as other on every criterion."""
+        return (
+            self.fare <= other.fare
+            and self.transfers <= other.transfers
+            and self.stops <= other.stops
+        )
+
+
+class _StopNumbers:
+    """Lazily built station -> stop_int lookup per route."""
+
+    def __init__(self, index: MetadataIndex):
+        self.index = index
+        self._routes: Dict[uuid.UUID, Dict[uuid.UUID, int]] = {}
+
+    def get(self, route_id: uuid.UUID, station_id: uuid.UUID) -> Optional[int]:
+        numbers = self._routes.get(route_id)
+        if numbers is None:
+            route = self.index.get_route(route_id)
+            numbers = (
+                {stop.station_id: stop.stop_int for stop in route.stops}
+                if route is not None
+                else {}
+            )
+            self._routes[route_id] = numbers
+        return numbers.get(station_id)
+
+
+def _insert(bag: List[Journey], journey: Journey) -> bool:
+    """
+    Add a journey to a Pareto bag unless an existing one dominates it,
+    dropping the ones it dominates.
+
+    Returns:
+        True if the journey was added
+    """
+    if any(existing.dominates(journey) for existing in bag):
+        return False
+    bag[:] = [existing for existing in bag if not journey.dominates(existing)]
+    bag.append(journey)
+    return True
+
+
+def plan_journeys(
+    graph: CompactGraph,
+    index: MetadataIndex,
+    origin: uuid.UUID,
+    destination: uuid.UUID,
+    direct_price: Optional[float] = None,
+    max_transfers: int = PLANNER_MAX_TRANSFERS,
+) -> List[Journey]:
+    """
+    Compute the Pareto set of journeys over fare, line changes and stops.
+
+    A journey is a sequence of legs, each riding a single route between two
+    stations with a ticket_price entry. The fare graph supplies the priced
+    hub connections, so line changes can only happen at hubs; the metadata
+    index supplies which routes serve each station and their stop_int order.
+    The search runs in rounds, round k extending every journey that improved
+    in round k - 1 by one more leg, and keeps per station and arrival route
+    only the journeys no other journey beats on all three criteria. (Arrival
+    routes are kept apart because a journey cannot change onto the line it
+    arrived on.) A journey is also dropped as soon as one that already
+    reaches the destination dominates it.
+
+    Args:
+        graph: The frozen fare graph
+        index: The station and route metadata
+        origin: UUID of the origin station
+        destination: UUID of the destination station
+        direct_price: Ticket price between origin and destination, if any
+        max_transfers: Most line changes a journey may make
+
+    Returns:
+        The non-dominated journeys, cheapest first
+    """
+    stop_numbers = _StopNumbers(index)
+
+    def legs_between(
+        start_id: uuid.UUID, end_id: uuid.UUID, price: float
+    ) -> List[JourneyLeg]:
+        shared = index.station_routes.get(start_id, set()) & index.station_routes.get(
+            end_id, set()
+        )
+        legs = []
+        for route_id in shared:
+            start_stop = stop_numbers.get(route_id, start_id)
+            end_stop = stop_numbers.get(route_id, end_id)
+            if start_stop is None or end_stop is None:
+                continue
+            legs.append(
+                JourneyLeg(
+                    start_id, end_id, route_id, price, abs(end_stop - start_stop)
+                )
+            )
+        return legs
+
+    # Journeys by (station, route they arrived on), and at the destination
+    bags: Dict[Tuple[uuid.UUID, Optional[uuid.UUID]], List[Journey]] = {}
+    arrivals: List[Journey] = []
+
+    def extend(journey: Journey, leg: JourneyLeg) -> None:
+        if journey.legs and journey.legs[-1].route_id == leg.route_id:
+            # Staying on the same line is a single leg, not a line change
+            return
+        extended = Journey(
+            journey.legs + (leg,),
+            journey.fare + leg.price,
+            len(journey.legs),
+            journey.stops + leg.stops,
+        )
+        if leg.end_id == destination:
+            # Arrivals are final and are never extended
+            _insert(arrivals, extended)
+            return
+        if any(arrival.dominates(extended) for arrival in arrivals):
+            return
+        key = (leg.end_id, leg.route_id)
+        if _insert(bags.setdefault(key, []), extended):
+            improved.setdefault(key, []).append(extended)
+
+    start = Journey((), 0.0, 0, 0)
+    # The direct ticket covers origin and destination on a shared route even
+    # when neither of them is a hub
+    if direct_price is not None:
+        for leg in legs_between(origin, destination, direct_price):
+            extend(start, leg)
+    bags[(origin, None)] = [start]
+    marked: Dict[Tuple[uuid.UUID, Optional[uuid.UUID]], List[Journey]] = {
+        (origin, None): [start]
+    }
+
+    for _ in range(max_transfers + 1):
+        improved: Dict[Tuple[uuid.UUID, Optional[uuid.UUID]], List[Journey]] = {}
+        for key, journeys in marked.items():
+            station_id = key[0]
+            if station_id not in graph.nodes:
+                continue
+            for neighbor, price in graph.get_neighbors(station_id):
+                if neighbor == origin:
+                    continue
+                legs = legs_between(station_id, neighbor, price)
+                for journey in journeys:
+                    # Journeys dominated since they were marked are dead ends
+                    if journey not in bags[key]:
+                        continue
+                    for leg in legs:
+                        extend(journey, leg)
+
+        # Only journeys that improved this round are extended in the next
+        if not improved:
+            break
+        marked = improved
+
+    return sorted(arrivals, key=lambda journey: journey[1:])
@@ -1,9 +1,93 @@
+import atexit
+import copy
 import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict
 
 import colorlog
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Log file, rotated once it reaches LOG_FILE_MAX_BYTES with LOG_FILE_BACKUPS
+# old files kept; set to an empty string to log to the console only
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "5"))
+# Records waiting for the writer thread; further records are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of records kept per level, e.g. "DEBUG=0.01,INFO=0.5"; levels
+# that are not listed are always kept
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+
+def _parse_sample_rates(value: str) -> Dict[int, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        level, _, rate = item.partition("=")
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+class SamplingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without blocking the caller. Records
+    are sampled per level before they are queued, and dropped rather than
+    waited on when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample_rates: Dict[int, float]):
+        super().__init__(log_queue)
+        self.sample_rates = sample_rates
+        self.sampled_out = 0
+        self.dropped = 0
+        self._reported = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sample_rates.get(record.levelno)
+        if rate is not None and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        return super().filter(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The base class formats the record here, on the caller's thread.
+        # Only the arguments are merged into the message, so that later
+        # changes to them cannot alter it; the handlers' formats and any
+        # traceback are rendered on the listener's thread.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+
+        if self.dropped > self._reported:
+            # Drops are reported once the queue has room again
+            warning = logging.makeLogRecord(
+                {
+                    "name": record.name,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"{self.dropped - self._reported} log records were dropped because the log queue was full",
+                }
+            )
+            try:
+                self.queue.put_nowait(warning)
+                self._reported = self.dropped
+            except queue.Full:
+                pass
+
+
 logger = logging.getLogger("app_logger")
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
 console_handler = colorlog.StreamHandler()
 
@@ -11,14 +95,31 @@ console_formatter = colorlog.ColoredFormatter(
     "%(log_color)s%(levelname)s: %(message)s", datefmt="%Y-%m-%d %H:%M;%S", reset=True
 )
 console_handler.setFormatter(console_formatter)
+handlers = [console_handler]
+
+if LOG_FILE:
+    file_handler = RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS
+    )
+    file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    file_handler.setFormatter(file_formatter)
+    handlers.append(file_handler)
 
-file_handler = logging.FileHandler("app.log")
-file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(file_formatter)
+# Records are formatted and written on the listener's thread (see
+# SamplingQueueHandler.prepare), so a log call on the event loop costs a
+# queue put instead of formatting, console and disk I/O
+log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = SamplingQueueHandler(log_queue, _parse_sample_rates(LOG_SAMPLE_RATES))
+listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
 
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+logger.addHandler(queue_handler)
 
 logger.propagate = False
 
+listener.start()
+
+
+# Writes out the records still queued when the process exits
+atexit.register(listener.stop)
+
 logger.info("Logger initialized successfully")
@@ -0,0 +1,235 @@
+import bisect
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """Base of the metrics rendered in the Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """Yield (sample name, label names, label values, value) tuples."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(
+                f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        for labelvalues, value in self._values.items():
+            yield self.name, self.labelnames, labelvalues, value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: the count of each bucket (the last one is +Inf),
+        # not cumulative, followed by the sum of the observed values
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        counts = self._values.get(labelvalues)
+        if counts is None:
+            counts = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        labelnames = self.labelnames + ("le",)
+        for labelvalues, counts in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    labelnames,
+                    labelvalues + (_format_value(bound),),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", self.labelnames, labelvalues, counts[-1]
+            yield f"{self.name}_count", self.labelnames, labelvalues, cumulative
+
+
+class CallbackMetric(Metric):
+    """
+    A counter or gauge read at scrape time from state kept elsewhere, such
+    as the hit counters of a cache. The callback returns the value, or a
+    mapping of label values to values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+        type: str = "gauge",
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.callback = callback
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in values.items():
+            yield self.name, self.labelnames, labelvalues, value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests handled",
+        ("method", "route", "status"),
+    )
+)
+REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests being handled")
+)
+REQUEST_DURATION = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving an HTTP request to sending the last of its response",
+        ("method", "route", "status"),
+    )
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the count and latency of every HTTP request,
+    labelled by method, route template and status code. Requests that match
+    no route are labelled "unmatched" so that arbitrary paths do not each
+    create a new series.
+
+    Metrics are kept per process: behind several workers, each scrape sees
+    the worker that served it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            labels = (scope["method"], route, str(status_code))
+            REQUESTS.inc(*labels)
+            REQUEST_DURATION.observe(time.perf_counter() - started, *labels)
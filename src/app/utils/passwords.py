@@ -0,0 +1,59 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.utils.logger import logger
+
+# Threads hashing passwords concurrently. bcrypt releases the GIL, so up to
+# one per core hash in parallel while the event loop keeps serving requests
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+# Hashes queued or running before further sign-ins are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+T = TypeVar("T")
+
+pwd_context = CryptContext(schemes=["bcrypt"])
+
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_pending = 0
+
+
+async def _run(func: Callable[..., T], *args) -> T:
+    """
+    Run a bcrypt call on the hashing pool. A bcrypt round takes 100-300 ms of
+    CPU, so running it on the event loop would stall every other request for
+    that long.
+
+    Raises:
+        HTTPException: 503 if PASSWORD_HASH_MAX_PENDING hashes are already
+            queued or running
+    """
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        logger.error(f"Password hashing queue is full ({_pending} pending)")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy. Please try again later.",
+        )
+
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(pwd_context.verify, plain_password, hashed_password)
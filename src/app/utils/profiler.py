@@ -0,0 +1,188 @@
+import asyncio
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+from typing import List, Optional
+
+# Longest a single profile may run for
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+# Leaf frames of threads that are blocked waiting for work, left out of the
+# report unless idle stacks are asked for
+IDLE_FRAMES = {
+    "concurrent.futures.thread._worker",
+    "selectors.EpollSelector.select",
+    "selectors.KqueueSelector.select",
+    "selectors.PollSelector.select",
+    "selectors.SelectSelector.select",
+    "threading.Condition.wait",
+}
+
+# Pool threads are numbered; their samples are aggregated per pool
+_THREAD_NUMBER = re.compile(r"_\d+$")
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    name = getattr(code, "co_qualname", code.co_name)
+    # Semicolons separate the frames of a collapsed stack
+    return f"{module}.{name}".replace(";", ":")
+
+
+def _thread_stack(frame: Optional[FrameType]) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _coroutine_stack(coro) -> List[str]:
+    """The await chain of a suspended coroutine, outermost first."""
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_label(frame))
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        if awaited is not None and not hasattr(awaited, "cr_frame"):
+            # A future (awaited through its iterator) or another awaitable
+            # that is not a coroutine
+            name = type(awaited).__name__
+            stack.append(f"<{'Future' if name == 'FutureIter' else name}>")
+            break
+        coro = awaited
+    return stack
+
+
+class StackSampler:
+    """
+    Samples the stacks of every thread of the process from a background
+    thread and counts them in the collapsed format that flamegraph.pl and
+    speedscope read ("frame;frame;frame count").
+
+    Stacks are rooted at the thread they were taken on: "event-loop" for
+    the thread running the asyncio loop, or the name of the thread pool
+    (password hashing, asyncio.to_thread, logging). On-CPU samples of the
+    event loop only show the task running at that instant, so with tasks
+    set the await chains of the suspended tasks are sampled too, rooted at
+    "awaiting". Those show where requests spend wall time waiting, on the
+    database for instance.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        interval: float,
+        tasks: bool = True,
+        idle: bool = False,
+    ):
+        self.loop = loop
+        self.interval = interval
+        self.tasks = tasks
+        self.idle = idle
+        self.counts: Counter = Counter()
+        self.samples = 0
+        # The sampler is created on the event loop thread, by the task that
+        # waits for the profile, which is left out of it
+        self._loop_thread = threading.get_ident()
+        self._profiling_task = asyncio.current_task(loop)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = _thread_stack(frame)
+            if not self.idle and stack and stack[-1] in IDLE_FRAMES:
+                continue
+            if ident == self._loop_thread:
+                root = "event-loop"
+            else:
+                root = "thread " + _THREAD_NUMBER.sub("", names.get(ident, str(ident)))
+            self.counts[";".join([root] + stack)] += 1
+
+        if self.tasks:
+            running = asyncio.current_task(self.loop)
+            try:
+                tasks = list(asyncio.all_tasks(self.loop))
+            except RuntimeError:
+                # The task set changed size while it was being copied
+                tasks = []
+            for task in tasks:
+                if task is running or task is self._profiling_task or task.done():
+                    continue
+                stack = _coroutine_stack(task.get_coro())
+                if stack:
+                    self.counts[";".join(["awaiting"] + stack)] += 1
+
+        self.samples += 1
+
+    def render(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.counts.most_common()
+        )
+
+
+class ProfileRunningError(Exception):
+    pass
+
+
+_active: Optional[StackSampler] = None
+
+
+async def profile(
+    seconds: float, interval: float, tasks: bool, idle: bool
+) -> StackSampler:
+    """
+    Sample the process for a while, letting the event loop keep serving
+    requests meanwhile.
+
+    Args:
+        seconds: How long to sample for
+        interval: Seconds between samples
+        tasks: Also sample the await chains of suspended tasks
+        idle: Keep the samples of threads waiting for work
+
+    Returns:
+        The stopped sampler
+
+    Raises:
+        ProfileRunningError: If a profile is already running in this process
+    """
+    global _active
+    if _active is not None:
+        raise ProfileRunningError("A profile is already running")
+
+    sampler = StackSampler(asyncio.get_running_loop(), interval, tasks, idle)
+    _active = sampler
+    sampler.start()
+    try:
+        await asyncio.sleep(min(seconds, PROFILER_MAX_SECONDS))
+    finally:
+        _active = None
+        await asyncio.to_thread(sampler.stop)
+    return sampler
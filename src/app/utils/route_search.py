@@ -0,0 +1,442 @@
+import asyncio
+import heapq
+import os
+import time
+import uuid
+from array import array
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.utils.graph import CompactGraph
+from app.utils.logger import logger
+
+# Landmarks precomputed per graph for the A* lower bound; 0 disables them
+ROUTE_SEARCH_LANDMARKS = int(os.getenv("ROUTE_SEARCH_LANDMARKS", "8"))
+
+
+class SearchResult(NamedTuple):
+    path: List[uuid.UUID]
+    distance: float
+    # Nodes settled by both search directions together
+    settled: int
+
+
+def _shortest_path_tree(graph: CompactGraph, source: int) -> Tuple[array, array]:
+    """
+    Single-source Dijkstra over every node.
+
+    Args:
+        graph: The graph to traverse
+        source: Dense id of the source node
+
+    Returns:
+        A tuple containing:
+        - distances: Distance from source to every node, infinity if unreachable
+        - parents: Previous node on each shortest path, -1 for the source and
+          unreachable nodes
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    distances = array("d", [float("infinity")]) * graph.get_node_count()
+    parents = array("q", [-1]) * graph.get_node_count()
+    distances[source] = 0.0
+
+    priority_queue = [(0.0, source)]
+    while priority_queue:
+        current_distance, current_node = heapq.heappop(priority_queue)
+        if current_distance > distances[current_node]:
+            continue
+        for k in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[k]
+            distance = current_distance + weights[k]
+            if distance < distances[neighbor]:
+                distances[neighbor] = distance
+                parents[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance, neighbor))
+
+    return distances, parents
+
+
+class LandmarkIndex:
+    """
+    Landmark distance tables for the ALT (A*, landmarks, triangle inequality)
+    lower bound. For every landmark L the tables hold d(L, v) and d(v, L) for
+    all nodes v, which bound any distance from below:
+    d(v, w) >= max(d(L, w) - d(L, v), d(v, L) - d(w, L)).
+    """
+
+    def __init__(self, graph: CompactGraph, count: int = ROUTE_SEARCH_LANDMARKS):
+        """
+        Pick landmarks and compute their distance tables.
+
+        Args:
+            graph: The compact graph the tables are built for
+            count: Maximum number of landmarks
+        """
+        self.graph = graph
+        self.landmarks: List[int] = []
+        self.from_landmark: List[array] = []
+        self.to_landmark: List[array] = []
+
+        node_count = graph.get_node_count()
+        if node_count == 0:
+            return
+        transposed = graph.transpose()
+
+        # Farthest-first selection pushes landmarks to the edges of the
+        # network, where they give the tightest bounds. Nodes no landmark
+        # reaches yet are infinitely far, so every component gets one.
+        nearest = array("d", [float("infinity")]) * node_count
+        candidate = 0
+        for _ in range(min(count, node_count)):
+            self.landmarks.append(candidate)
+            from_landmark = _shortest_path_tree(graph, candidate)[0]
+            self.from_landmark.append(from_landmark)
+            self.to_landmark.append(_shortest_path_tree(transposed, candidate)[0])
+
+            farthest = 0.0
+            for node in range(node_count):
+                if from_landmark[node] < nearest[node]:
+                    nearest[node] = from_landmark[node]
+                if nearest[node] > farthest:
+                    farthest = nearest[node]
+                    candidate = node
+            if farthest == 0.0:
+                break
+
+    def lower_bound(self, node: int, target: int) -> float:
+        """
+        Get a lower bound on the distance between two nodes.
+
+        Args:
+            node: Dense id of the node to start from
+            target: Dense id of the node to reach
+
+        Returns:
+            A distance no greater than the true shortest distance
+        """
+        infinity = float("infinity")
+        bound = 0.0
+        for from_landmark, to_landmark in zip(self.from_landmark, self.to_landmark):
+            # Differences involving unreachable nodes are infinite or NaN and
+            # would break the potentials; skipping them keeps the bound valid
+            forward = from_landmark[target] - from_landmark[node]
+            if bound < forward < infinity:
+                bound = forward
+            backward = to_landmark[node] - to_landmark[target]
+            if bound < backward < infinity:
+                bound = backward
+        return bound
+
+
+class LandmarkCache:
+    """
+    Holds the LandmarkIndex of the current snapshot graph and builds it in
+    the background. Searches run without landmarks until it is ready.
+    """
+
+    def __init__(self, count: int = ROUTE_SEARCH_LANDMARKS):
+        self.count = count
+        self.index: Optional[LandmarkIndex] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def current(self, graph: CompactGraph) -> Optional[LandmarkIndex]:
+        """
+        Get the landmarks for a graph, starting a build if there are none.
+
+        Args:
+            graph: The frozen graph queries are being answered against
+
+        Returns:
+            The matching LandmarkIndex, or None if it is not built yet
+        """
+        if self.count <= 0:
+            return None
+        index = self.index
+        if index is not None and index.graph is graph:
+            return index
+        if not self.is_building():
+            self._task = asyncio.create_task(self._build(graph))
+        return None
+
+    def is_building(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _build(self, graph: CompactGraph) -> None:
+        try:
+            started = time.perf_counter()
+            index = await asyncio.to_thread(LandmarkIndex, graph, self.count)
+            self.index = index
+            logger.info(
+                f"Route search landmarks built: {len(index.landmarks)} landmarks for {graph.get_node_count()} stations "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+        except Exception as e:
+            logger.error(f"Error building route search landmarks: {str(e)}")
+
+
+def find_path(
+    graph: CompactGraph,
+    start: uuid.UUID,
+    end: uuid.UUID,
+    landmarks: Optional[LandmarkIndex] = None,
+) -> SearchResult:
+    """
+    Find the cheapest path between two nodes with a bidirectional search.
+
+    A forward search from start and a backward search from end take turns
+    settling whichever frontier node is closer, and stop as soon as the two
+    frontiers cannot improve on the best meeting point found. With landmarks
+    both searches are guided towards each other by the average ALT potential,
+    which keeps the number of settled nodes far below the network size on
+    long queries. Labels are kept in dicts, so a query only allocates for the
+    nodes it touches.
+
+    Args:
+        graph: The compact graph to search
+        start: UUID of the starting node
+        end: UUID of the target node
+        landmarks: Optional landmark tables built for this graph
+
+    Returns:
+        The path (empty if end is unreachable), its total weight and the
+        number of nodes settled
+
+    Raises:
+        ValueError: If start or end is not in the graph
+    """
+    if start not in graph.nodes:
+        raise ValueError(f"Start node {start} not in graph")
+    if end not in graph.nodes:
+        raise ValueError(f"End node {end} not in graph")
+
+    infinity = float("infinity")
+    source = graph.index[start]
+    target = graph.index[end]
+    if source == target:
+        return SearchResult([start], 0.0, 0)
+
+    potential = _average_potential(landmarks, source, target)
+
+    # Index 0 is the forward search over outgoing edges, index 1 the
+    # backward search over incoming edges (the transposed graph)
+    csr = (graph, graph.transpose())
+    signs = (1.0, -1.0)
+    distances: tuple = ({source: 0.0}, {target: 0.0})
+    parents: tuple = ({source: -1}, {target: -1})
+    settled: tuple = (set(), set())
+    queues: tuple = ([(potential(source), source)], [(-potential(target), target)])
+
+    best = infinity
+    meeting = -1
+    settled_count = 0
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        _, current_node = heapq.heappop(queues[side])
+        if current_node in settled[side]:
+            continue
+        settled[side].add(current_node)
+        settled_count += 1
+
+        own, other = distances[side], distances[1 - side]
+        current_distance = own[current_node]
+        step, sign = csr[side], signs[side]
+        for k in range(step.offsets[current_node], step.offsets[current_node + 1]):
+            neighbor = step.targets[k]
+            distance = current_distance + step.weights[k]
+
+            through = distance + other.get(neighbor, infinity)
+            if through < best:
+                best = through
+                meeting = neighbor
+
+            if distance < own.get(neighbor, infinity):
+                own[neighbor] = distance
+                parents[side][neighbor] = current_node
+                heapq.heappush(
+                    queues[side], (distance + sign * potential(neighbor), neighbor)
+                )
+
+    if meeting < 0:
+        return SearchResult([], infinity, settled_count)
+
+    path = []
+    node = meeting
+    while node >= 0:
+        path.append(node)
+        node = parents[0][node]
+    path.reverse()
+    node = parents[1][meeting]
+    while node >= 0:
+        path.append(node)
+        node = parents[1][node]
+
+    return SearchResult([graph.ids[node] for node in path], best, settled_count)
+
+
+def _average_potential(
+    landmarks: Optional[LandmarkIndex], source: int, target: int
+) -> Callable[[int], float]:
+    # The forward search uses p(v) = (bound(v, target) - bound(source, v)) / 2
+    # and the backward search -p(v). Both are consistent, so the usual
+    # bidirectional stopping rule still holds on the reduced weights.
+    if landmarks is None or not landmarks.landmarks:
+        return lambda node: 0.0
+
+    cache: Dict[int, float] = {}
+
+    def potential(node: int) -> float:
+        value = cache.get(node)
+        if value is None:
+            value = (
+                landmarks.lower_bound(node, target)
+                - landmarks.lower_bound(source, node)
+            ) / 2
+            cache[node] = value
+        return value
+
+    return potential
+
+
+def k_shortest_paths(
+    graph: CompactGraph, start: uuid.UUID, end: uuid.UUID, k: int
+) -> List[Tuple[List[uuid.UUID], float]]:
+    """
+    Find the k cheapest loopless paths between two nodes (Yen's algorithm).
+
+    Every spur search in Yen's algorithm runs on the graph with some nodes
+    and edges removed, which can only lengthen distances. A single backward
+    shortest-path tree to end therefore serves all of them: its distances
+    are an exact A* heuristic, and whenever the tree path behind the
+    cheapest allowed first hop avoids the removed nodes it is the spur path
+    itself, with no search at all. k alternatives thus cost little more
+    than one query.
+
+    Args:
+        graph: The compact graph to search
+        start: UUID of the starting node
+        end: UUID of the target node
+        k: Number of paths wanted
+
+    Returns:
+        Up to k (path, total weight) tuples, cheapest first
+
+    Raises:
+        ValueError: If start or end is not in the graph
+    """
+    if start not in graph.nodes:
+        raise ValueError(f"Start node {start} not in graph")
+    if end not in graph.nodes:
+        raise ValueError(f"End node {end} not in graph")
+
+    infinity = float("infinity")
+    source = graph.index[start]
+    target = graph.index[end]
+    # parents in the backward tree are next hops towards the target
+    to_target, next_hops = _shortest_path_tree(graph.transpose(), target)
+    if to_target[source] == infinity:
+        return []
+
+    def edge_weight(node: int, neighbor: int) -> float:
+        return min(
+            graph.weights[position]
+            for position in graph.edge_range(node)
+            if graph.targets[position] == neighbor
+        )
+
+    def spur_path(
+        spur: int, removed_nodes: Set[int], removed_edges: Set[int]
+    ) -> Optional[Tuple[List[int], float]]:
+        # Removed edges all leave the spur node. No spur path can beat the
+        # cheapest remaining first hop plus its tree distance, so if that
+        # hop's tree path avoids the removed nodes it is the answer.
+        first_hops = sorted(
+            (graph.weights[position] + to_target[graph.targets[position]], position)
+            for position in graph.edge_range(spur)
+            if graph.targets[position] not in removed_edges
+            and graph.targets[position] not in removed_nodes
+        )
+        for bound, position in first_hops:
+            if bound > first_hops[0][0] or bound == infinity:
+                break
+            path = [spur]
+            node = graph.targets[position]
+            while node >= 0 and node != spur and node not in removed_nodes:
+                path.append(node)
+                node = next_hops[node]
+            if path[-1] == target:
+                return path, bound
+
+        # A* from the spur node, guided by the distances to the target
+        distances = {spur: 0.0}
+        parents = {spur: -1}
+        settled = set()
+        priority_queue = [(to_target[spur], spur)]
+        while priority_queue:
+            _, current_node = heapq.heappop(priority_queue)
+            if current_node == target:
+                break
+            if current_node in settled:
+                continue
+            settled.add(current_node)
+            for position in graph.edge_range(current_node):
+                neighbor = graph.targets[position]
+                if neighbor in removed_nodes or neighbor in settled:
+                    continue
+                if current_node == spur and neighbor in removed_edges:
+                    continue
+                if to_target[neighbor] == infinity:
+                    continue
+                distance = distances[current_node] + graph.weights[position]
+                if distance < distances.get(neighbor, infinity):
+                    distances[neighbor] = distance
+                    parents[neighbor] = current_node
+                    heapq.heappush(
+                        priority_queue, (distance + to_target[neighbor], neighbor)
+                    )
+
+        if target not in distances:
+            return None
+        path = []
+        node = target
+        while node >= 0:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        return path, distances[target]
+
+    first = [source]
+    while first[-1] != target:
+        first.append(next_hops[first[-1]])
+    found: List[Tuple[List[int], float]] = [(first, to_target[source])]
+    candidates: List[Tuple[float, List[int]]] = []
+    seen = {tuple(first)}
+
+    while len(found) < k:
+        previous, _ = found[-1]
+        root_cost = 0.0
+        for i in range(len(previous) - 1):
+            spur = previous[i]
+            root = previous[: i + 1]
+            removed_edges = {
+                path[i + 1]
+                for path, _ in found
+                if len(path) > i + 1 and path[: i + 1] == root
+            }
+            spur_result = spur_path(spur, set(root[:-1]), removed_edges)
+            if spur_result is not None:
+                path = root[:-1] + spur_result[0]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (root_cost + spur_result[1], path))
+            root_cost += edge_weight(spur, previous[i + 1])
+
+        if not candidates:
+            break
+        cost, path = heapq.heappop(candidates)
+        found.append((path, cost))
+
+    return [([graph.ids[node] for node in path], cost) for path, cost in found]
+
+
+landmarks = LandmarkCache()
@@ -0,0 +1,77 @@
+import asyncio
+import fcntl
+import mmap
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.utils.logger import logger
+
+
+def map_file(path: str) -> Optional[mmap.mmap]:
+    """
+    Memory-map a file read-only. Every process mapping the same file shares
+    its physical pages through the page cache.
+
+    Args:
+        path: File to map
+
+    Returns:
+        The mapping, or None if the file is missing, empty or unreadable
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "rb") as file:
+            # The mapping stays valid after the file is closed
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to map {path}: {str(e)}")
+        return None
+
+
+def write_file_atomic(path: str, data: bytes) -> bool:
+    """
+    Write a file through a temporary file and rename, so readers (and
+    existing mappings of the old file) never see a partial write.
+
+    Args:
+        path: Destination path
+        data: File contents
+
+    Returns:
+        True if the file was written
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        logger.warning(f"Failed to write {path}: {str(e)}")
+        return False
+
+
+@asynccontextmanager
+async def leader_lock(path: str) -> AsyncIterator[None]:
+    """
+    Hold an exclusive advisory lock on a file, shared by all worker processes
+    on the host. The first worker to take it does the expensive work and
+    writes the shared files; the others wait and then only attach to them.
+
+    Args:
+        path: Lock file path; an empty path disables locking
+    """
+    if not path:
+        yield
+        return
+
+    with open(path, "a") as lock_file:
+        # flock blocks, so wait for it off the event loop
+        await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
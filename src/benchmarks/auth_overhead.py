@@ -0,0 +1,107 @@
+"""
+Measure the per-request cost of authenticating a bearer token.
+
+Times decoding a token from scratch against a claims cache hit, then the
+latency of requests to an in-process app with no authentication, with the
+claims cache disabled and with it enabled.
+
+Usage (from src/):
+    JWT_SECRET_KEY=... python -m benchmarks.auth_overhead [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import timeit
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.utils.auth import (
+    claims_cache,
+    create_access_token,
+    decode_access_token,
+    get_current_user,
+)
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/public")
+    async def public():
+        return {"ok": True}
+
+    @app.get("/private")
+    async def private(claims: Dict[str, Any] = Depends(get_current_user)):
+        return {"ok": True}
+
+    return app
+
+
+async def request_latencies(
+    client: httpx.AsyncClient, path: str, headers: Dict[str, str], count: int
+) -> List[float]:
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+        assert response.status_code == 200, response.text
+    return latencies
+
+
+async def main(requests: int) -> None:
+    token = create_access_token(
+        {"sub": "01700000000", "user_id": "benchmark", "role": "user"}
+    )
+
+    max_size = claims_cache.max_size
+    claims_cache.max_size = 0
+    uncached = timeit.timeit(lambda: decode_access_token(token), number=requests)
+    claims_cache.max_size = max_size
+    decode_access_token(token)
+    cached = timeit.timeit(lambda: decode_access_token(token), number=requests)
+    print(f"decode_access_token, no cache: {uncached / requests * 1e6:8.2f} us")
+    print(f"decode_access_token, cached:   {cached / requests * 1e6:8.2f} us")
+
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        # Warm up the app and the client before timing anything
+        await request_latencies(client, "/public", {}, 100)
+
+        public = await request_latencies(client, "/public", {}, requests)
+        claims_cache.max_size = 0
+        claims_cache.clear()
+        private_uncached = await request_latencies(
+            client, "/private", headers, requests
+        )
+        claims_cache.max_size = max_size
+        private_cached = await request_latencies(client, "/private", headers, requests)
+
+    baseline = statistics.median(public)
+    print()
+    for label, latencies in (
+        ("no auth", public),
+        ("auth, no cache", private_uncached),
+        ("auth, cached", private_cached),
+    ):
+        median = statistics.median(latencies)
+        print(
+            f"request {label:>14}: median {median:8.1f} us"
+            f"  overhead {median - baseline:8.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="Requests timed per case"
+    )
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.requests))
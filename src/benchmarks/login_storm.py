@@ -0,0 +1,121 @@
+"""
+Measure how a burst of sign-ins affects the latency of other endpoints.
+
+A small app is served in process, on a single event loop as under uvicorn,
+with a sign-in endpoint that checks a bcrypt password and a cheap endpoint
+standing in for the rest of the API. The cheap endpoint is probed on its own
+first, then again while --logins clients sign in back to back. This is done
+once with bcrypt run inline on the event loop, as sign-in used to do, and
+once through app.utils.passwords. No database is needed.
+
+Usage (from src/):
+    python -m benchmarks.login_storm [--logins 32] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+
+from app.utils.passwords import pwd_context, verify_password
+
+PASSWORD = "correct horse"
+# Seconds between requests to the probed endpoint
+PROBE_INTERVAL = 0.01
+
+
+def build_app(password_hash: str, offloaded: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/signin")
+    async def signin():
+        if offloaded:
+            return {"ok": await verify_password(PASSWORD, password_hash)}
+        return {"ok": pwd_context.verify(PASSWORD, password_hash)}
+
+    @app.get("/stations")
+    async def stations():
+        return {"ok": True}
+
+    return app
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def probe(client: httpx.AsyncClient, seconds: float) -> List[float]:
+    """
+    Request the cheap endpoint every PROBE_INTERVAL seconds for a while.
+    Latency is measured from when each request was due rather than when it
+    was sent, so time spent waiting for a blocked event loop is counted.
+    """
+    latencies = []
+    started = time.perf_counter()
+    due = started
+    while time.perf_counter() < started + seconds:
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await client.get("/stations")
+        latencies.append((time.perf_counter() - due) * 1000)
+        due += PROBE_INTERVAL
+    return latencies
+
+
+async def storm(client: httpx.AsyncClient, stop: asyncio.Event) -> int:
+    signins = 0
+    while not stop.is_set():
+        await client.post("/signin")
+        signins += 1
+        # The in-process transport never yields on its own the way a socket
+        # would, so an inline handler would otherwise starve everything else
+        await asyncio.sleep(0)
+    return signins
+
+
+async def run(password_hash: str, offloaded: bool, logins: int, seconds: float) -> None:
+    app = build_app(password_hash, offloaded)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+        idle = await probe(client, seconds)
+
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        clients = [asyncio.create_task(storm(client, stop)) for _ in range(logins)]
+        loaded = await probe(client, seconds)
+        stop.set()
+        signins = sum(await asyncio.gather(*clients))
+        elapsed = time.perf_counter() - started
+
+    mode = "thread pool" if offloaded else "inline"
+    print(f"\nbcrypt {mode}: {signins / elapsed:.1f} sign-ins/s")
+    for label, latencies in (("idle", idle), ("during storm", loaded)):
+        print(
+            f"  /stations {label:>12}: p50 {statistics.median(latencies):8.2f} ms"
+            f"  p99 {percentile(latencies, 0.99):8.2f} ms"
+            f"  max {max(latencies):8.2f} ms"
+        )
+
+
+async def main(logins: int, seconds: float) -> None:
+    password_hash = pwd_context.hash(PASSWORD)
+    for offloaded in (False, True):
+        await run(password_hash, offloaded, logins, seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--logins", type=int, default=32, help="Concurrent sign-in clients"
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=5, help="How long each phase is probed"
+    )
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.logins, arguments.seconds))
@@ -0,0 +1,214 @@
+"""
+Compare the query plans of the hot endpoint queries with and without the
+secondary indexes added by migration 013_add_hot_path_indexes.sql.
+
+Every query is run under EXPLAIN (ANALYZE, BUFFERS) twice: once inside a
+transaction that drops the indexes first ("before") and once with them in
+place ("after"). Both transactions are rolled back, so the database is left
+unchanged, but DROP INDEX takes an exclusive lock on each table while the
+"before" pass runs: point it at a development database only.
+
+Usage (from src/, with DATABASE_URL set):
+    python -m benchmarks.query_plans [--runs 5] [--verbose]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.db.connection import get_db_connection
+from app.utils.graph_builder import HUB_CONNECTIONS_QUERY
+
+# Indexes the "before" pass drops. The users indexes back UNIQUE constraints
+# that every deployment already has, so they cannot be dropped and are left
+# out of the comparison.
+BENCHMARKED_INDEXES = [
+    "routes_stations_route_stop_idx",
+    "routes_stations_station_idx",
+    "ticket_price_pair_idx",
+    "ticket_price_station2_idx",
+    "trains_route_idx",
+    "wallets_user_idx",
+    "user_history_user_date_idx",
+]
+
+
+class EndpointQuery(NamedTuple):
+    endpoint: str
+    sql: str
+    # Names of the sample values passed as $1, $2, ...
+    params: Tuple[str, ...]
+
+
+ENDPOINT_QUERIES = [
+    EndpointQuery(
+        "GET /routes/{route_id}",
+        """
+        SELECT r.route_id, r.station_id, s.station_name, s.location, r.stop_int, r.ticket_price
+        FROM routes_stations r
+            JOIN stations s ON r.station_id = s.station_id
+        WHERE r.route_id = $1
+        ORDER BY r.stop_int
+        """,
+        ("route_id",),
+    ),
+    EndpointQuery(
+        "POST /update_fare (graph refresh)",
+        HUB_CONNECTIONS_QUERY,
+        ("station_ids",),
+    ),
+    EndpointQuery(
+        "GET /calculate-fare (segment fallback)",
+        """
+        SELECT tp.price
+        FROM ticket_price tp
+        WHERE tp.station1_id = least($1::uuid, $2::uuid)
+            AND tp.station2_id = greatest($1::uuid, $2::uuid)
+        """,
+        ("station_id", "other_station_id"),
+    ),
+    EndpointQuery(
+        "DELETE /delete_station/{station_id} (fare cascade)",
+        """
+        SELECT station1_id FROM ticket_price WHERE station2_id = $1
+        """,
+        ("station_id",),
+    ),
+    EndpointQuery(
+        "DELETE /delete_route/{route_id} (train cascade)",
+        """
+        SELECT train_id FROM trains WHERE route_id = $1
+        """,
+        ("route_id",),
+    ),
+    EndpointQuery(
+        "GET /users/{user_id}",
+        """
+        SELECT u.id, u.name, u.email, u.phone_number, w.balance, u.date_of_birth
+        FROM users u
+            JOIN wallets w ON u.id = w.user_id
+        WHERE u.id = $1
+        """,
+        ("user_id",),
+    ),
+    EndpointQuery(
+        "GET /users/{user_id}/history",
+        """
+        SELECT id, action, date, details
+        FROM user_history
+        WHERE user_id = $1
+        ORDER BY date DESC
+        LIMIT 50
+        """,
+        ("user_id",),
+    ),
+]
+
+
+class PlanSummary(NamedTuple):
+    execution_ms: float
+    # Node type and relation of every scan in the plan
+    scans: List[str]
+    plan: Dict[str, Any]
+
+
+async def sample_values(conn: Any) -> Dict[str, Any]:
+    """Pick real ids to run the queries with."""
+    stations = await conn.fetch(
+        "SELECT station_id FROM routes_stations GROUP BY station_id ORDER BY count(*) DESC LIMIT 2"
+    )
+    route_id = await conn.fetchval(
+        "SELECT route_id FROM routes_stations GROUP BY route_id ORDER BY count(*) DESC LIMIT 1"
+    )
+    user_id = await conn.fetchval(
+        "SELECT user_id FROM user_history GROUP BY user_id ORDER BY count(*) DESC LIMIT 1"
+    ) or await conn.fetchval("SELECT id FROM users LIMIT 1")
+
+    station_id = stations[0]["station_id"] if stations else None
+    other_station_id = stations[-1]["station_id"] if stations else None
+    return {
+        "route_id": route_id,
+        "station_id": station_id,
+        "other_station_id": other_station_id,
+        "station_ids": [station_id] if station_id else None,
+        "user_id": user_id,
+    }
+
+
+def _scans(node: Dict[str, Any]) -> List[str]:
+    scans = []
+    if "Scan" in node["Node Type"]:
+        target = node.get("Index Name") or node.get("Relation Name", "")
+        scans.append(f"{node['Node Type']} on {target}")
+    for child in node.get("Plans", []):
+        scans.extend(_scans(child))
+    return scans
+
+
+async def explain(
+    conn: Any, query: EndpointQuery, values: Dict[str, Any], runs: int
+) -> PlanSummary:
+    args = [values[name] for name in query.params]
+    timings = []
+    plan: Optional[Dict[str, Any]] = None
+    for _ in range(runs):
+        result = await conn.fetchval(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query.sql}", *args
+        )
+        plan = json.loads(result)[0]
+        timings.append(plan["Execution Time"])
+    return PlanSummary(statistics.median(timings), _scans(plan["Plan"]), plan)
+
+
+async def run_pass(
+    conn: Any, values: Dict[str, Any], runs: int, drop_indexes: bool
+) -> Dict[str, PlanSummary]:
+    results = {}
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        if drop_indexes:
+            for index in BENCHMARKED_INDEXES:
+                await conn.execute(f"DROP INDEX IF EXISTS {index}")
+        for query in ENDPOINT_QUERIES:
+            if any(values[name] is None for name in query.params):
+                continue
+            results[query.endpoint] = await explain(conn, query, values, runs)
+    finally:
+        await transaction.rollback()
+    return results
+
+
+async def main(runs: int, verbose: bool) -> None:
+    conn = await get_db_connection()
+    try:
+        values = await sample_values(conn)
+        before = await run_pass(conn, values, runs, drop_indexes=True)
+        after = await run_pass(conn, values, runs, drop_indexes=False)
+    finally:
+        await conn.close()
+
+    for query in ENDPOINT_QUERIES:
+        if query.endpoint not in after:
+            print(f"\n{query.endpoint}: skipped, no sample data")
+            continue
+        old, new = before[query.endpoint], after[query.endpoint]
+        print(f"\n{query.endpoint}")
+        print(f"  before: {old.execution_ms:8.3f} ms  {', '.join(old.scans)}")
+        print(f"  after:  {new.execution_ms:8.3f} ms  {', '.join(new.scans)}")
+        if verbose:
+            print(json.dumps({"before": old.plan, "after": new.plan}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--runs", type=int, default=5, help="EXPLAIN ANALYZE runs per query"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print the full JSON plans"
+    )
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.runs, arguments.verbose))
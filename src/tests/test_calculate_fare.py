@@ -0,0 +1,69 @@
+import json
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db.connection import get_db
+from app.routes import calculate_fare
+from app.utils.graph import StationInfo, WeightedGraph, metadata, snapshots
+from app.utils.journey_cache import journey_cache
+
+HUB_A = uuid.UUID("00000000-0000-0000-0000-00000000000a")
+HUB_B = uuid.UUID("00000000-0000-0000-0000-00000000000b")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    routing_graph = WeightedGraph()
+    routing_graph.add_bidirectional_edge(HUB_A, HUB_B, 20)
+    snapshots.publish(routing_graph)
+
+    monkeypatch.setattr(
+        metadata,
+        "stations",
+        {
+            station_id: StationInfo(station_id, name, "", "active")
+            for station_id, name in ((HUB_A, "Hub A"), (HUB_B, "Hub B"))
+        },
+    )
+    monkeypatch.setattr(metadata, "fares", {})
+    monkeypatch.setattr(metadata, "station_fares", {})
+    monkeypatch.setattr(metadata, "loaded_at", float("inf"))
+    journey_cache.clear()
+
+    async def no_db():
+        yield None
+
+    app = FastAPI()
+    app.include_router(calculate_fare.router)
+    app.dependency_overrides[get_db] = no_db
+    return TestClient(app)
+
+
+def test_same_origin_and_destination(client):
+    response = client.get(
+        "/calculate-fare",
+        params={"origin_station_id": HUB_A, "destination_station_id": HUB_A},
+    )
+
+    assert response.status_code == 200
+    journey = response.json()
+    assert journey["origin_station_name"] == "Hub A"
+    assert journey["destination_station_name"] == "Hub A"
+    assert journey["total_price"] == 0
+    assert journey["segments"] == []
+
+
+def test_batch_same_origin_and_destination(client):
+    pair = {"origin_station_id": str(HUB_A), "destination_station_id": str(HUB_A)}
+    response = client.post("/calculate-fare/batch", json={"pairs": [pair]})
+
+    assert response.status_code == 200
+    (line,) = response.text.splitlines()
+    result = json.loads(line)
+    assert result["error"] is None
+    assert result["journey"]["origin_station_name"] == "Hub A"
+    assert result["journey"]["total_price"] == 0
+    assert result["journey"]["segments"] == []